@@ -333,113 +333,127 @@ class MastermindAgent:
         from workers import GitWorker
 
         pr_monitor = PRMonitorWorker(session, self.codebase_path)
+        git_worker = GitWorker(session, self.codebase_path)
 
-        for ci_attempt in range(1, max_retries + 1):
-            logger.info(
-                f"CI check attempt {ci_attempt}/{max_retries} for PR #{pr_number}"
-            )
-
-            # Wait for CI to complete
-            await self._update_status(
-                session,
-                FixStatus.TESTING,
-                f"Waiting for CI (attempt {ci_attempt}/{max_retries})...",
-            )
-            pr_status = await pr_monitor.wait_for_ci(pr_number, timeout_minutes=15)
-
-            if not pr_status:
-                logger.error("Failed to get PR status")
-                return False
+        try:
 
-            if pr_status.overall_status == CIStatus.SUCCESS:
-                logger.info(f"CI passed for PR #{pr_number}")
-                return True
+            for ci_attempt in range(1, max_retries + 1):
+                logger.info(
+                    f"CI check attempt {ci_attempt}/{max_retries} for PR #{pr_number}"
+                )
 
-            if pr_status.overall_status != CIStatus.FAILURE:
-                logger.warning(f"CI status unknown: {pr_status.overall_status}")
-                return False
+                # Wait for CI to complete
+                await self._update_status(
+                    session,
+                    FixStatus.TESTING,
+                    f"Waiting for CI (attempt {ci_attempt}/{max_retries})...",
+                )
+                pr_status = await pr_monitor.wait_for_ci(pr_number, timeout_minutes=15)
 
-            # CI failed - analyze and try to fix
-            logger.info(f"CI failed for PR #{pr_number}, analyzing failures...")
-            await self._update_status(
-                session,
-                FixStatus.IMPLEMENTING,
-                f"Fixing CI failure (attempt {ci_attempt}/{max_retries})...",
-            )
+                if not pr_status:
+                    logger.error("Failed to get PR status")
+                    return False
 
-            # Get failure details
-            failures = pr_status.failures
-            if not failures:
-                failures = await pr_monitor.get_failure_details(pr_number)
+                if pr_status.overall_status == CIStatus.SUCCESS:
+                    logger.info(f"CI passed for PR #{pr_number}")
+                    return True
 
-            if not failures:
-                logger.error("CI failed but couldn't get failure details")
-                await self._record_failure(
-                    session, "ci_failure", "CI failed - unable to get details", strategy
-                )
-                return False
+                if pr_status.overall_status != CIStatus.FAILURE:
+                    logger.warning(f"CI status unknown: {pr_status.overall_status}")
+                    return False
 
-            # Log and record failures
-            for failure in failures:
-                logger.info(
-                    f"CI failure: {failure.failure_type} - {failure.error_message}"
-                )
-                await self._record_failure(
+                # CI failed - analyze and try to fix
+                logger.info(f"CI failed for PR #{pr_number}, analyzing failures...")
+                await self._update_status(
                     session,
-                    f"ci_{failure.failure_type}",
-                    failure.error_message,
-                    strategy,
+                    FixStatus.IMPLEMENTING,
+                    f"Fixing CI failure (attempt {ci_attempt}/{max_retries})...",
                 )
 
-            # Try to fix each failure
-            fixed_any = False
-            git_worker = GitWorker(session, self.codebase_path)
-
-            for failure in failures:
-                if failure.failure_type in ("lint", "black", "flake8"):
-                    # Lint failures can often be auto-fixed
-                    result = await pr_monitor.fix_lint_failure(failure)
-                    if result.success:
-                        fixed_any = True
-                        logger.info(f"Fixed lint failure: {failure.error_message}")
-                    elif result.data and result.data.get("needs_claude"):
-                        # Flake8 error that needs Claude to fix
-                        logger.info(
-                            f"Flake8 error needs Claude: {failure.error_message}"
-                        )
+                # Get failure details
+                failures = pr_status.failures
+                if not failures:
+                    failures = await pr_monitor.get_failure_details(pr_number)
+
+                if not failures:
+                    logger.error("CI failed but couldn't get failure details")
+                    await self._record_failure(
+                        session,
+                        "ci_failure",
+                        "CI failed - unable to get details",
+                        strategy,
+                    )
+                    return False
+
+                # Log and record failures
+                for failure in failures:
+                    logger.info(
+                        f"CI failure: {failure.failure_type} - {failure.error_message}"
+                    )
+                    await self._record_failure(
+                        session,
+                        f"ci_{failure.failure_type}",
+                        failure.error_message,
+                        strategy,
+                    )
+
+                # Try to fix each failure
+                fixed_any = False
+
+                # Lint failures can often be auto-fixed - all at once, so Black
+                # and flake8 each run once rather than per failure
+                lint_failures = [
+                    f for f in failures if f.failure_type in ("lint", "black", "flake8")
+                ]
+                lint_results = iter(await pr_monitor.fix_lint_failures(lint_failures))
+
+                for failure in failures:
+                    if failure.failure_type in ("lint", "black", "flake8"):
+                        result = next(lint_results)
+                        if result.success:
+                            fixed_any = True
+                            logger.info(f"Fixed lint failure: {failure.error_message}")
+                        elif result.data and result.data.get("needs_claude"):
+                            # Flake8 error that needs Claude to fix
+                            logger.info(
+                                f"Flake8 error needs Claude: {failure.error_message}"
+                            )
+                            fixed = await self._fix_ci_failure_with_claude(
+                                session, strategy, failure
+                            )
+                            if fixed:
+                                fixed_any = True
+                    else:
+                        # Other failures need Claude analysis
                         fixed = await self._fix_ci_failure_with_claude(
                             session, strategy, failure
                         )
                         if fixed:
                             fixed_any = True
-                else:
-                    # Other failures need Claude analysis
-                    fixed = await self._fix_ci_failure_with_claude(
-                        session, strategy, failure
-                    )
-                    if fixed:
-                        fixed_any = True
 
-            if not fixed_any:
-                logger.error("Could not fix any CI failures")
-                if ci_attempt >= max_retries:
-                    return False
-                await self._wait_for_learning(session)
-                continue
-
-            # Commit and push the fixes
-            await git_worker.commit_changes(
-                "fix: Address CI failures\n\nAuto-fix for CI check failures",
-                session.files_modified,
-            )
-            await git_worker.push_branch(session.branch_name)
-            logger.info("Pushed CI fixes, waiting for new CI run...")
+                if not fixed_any:
+                    logger.error("Could not fix any CI failures")
+                    if ci_attempt >= max_retries:
+                        return False
+                    await self._wait_for_learning(session)
+                    continue
+
+                # Commit and push the fixes
+                await git_worker.commit_changes(
+                    "fix: Address CI failures\n\nAuto-fix for CI check failures",
+                    session.files_modified,
+                )
+                await git_worker.push_branch(session.branch_name)
+                logger.info("Pushed CI fixes, waiting for new CI run...")
 
-            # Wait a bit for CI to restart
-            await asyncio.sleep(10)
+                # Wait a bit for CI to restart
+                await asyncio.sleep(10)
 
-        logger.error(f"CI still failing after {max_retries} attempts")
-        return False
+            logger.error(f"CI still failing after {max_retries} attempts")
+            return False
+        finally:
+            await pr_monitor.close()
+            await git_worker.close()
 
     async def _fix_ci_failure_with_claude(
         self,
@@ -535,12 +549,15 @@ IMPORTANT:
             code_worker = CodeWorker(
                 session, self.codebase_path, self.client, self.model
             )
-            success = await code_worker.edit_file(
-                file=fix.get("file"),
-                old_code=fix.get("old_code"),
-                new_code=fix.get("new_code"),
-                description=f"Fix CI: {failure.error_message[:50]}",
-            )
+            try:
+                success = await code_worker.edit_file(
+                    file=fix.get("file"),
+                    old_code=fix.get("old_code"),
+                    new_code=fix.get("new_code"),
+                    description=f"Fix CI: {failure.error_message[:50]}",
+                )
+            finally:
+                await code_worker.close()
 
             if success:
                 if fix.get("file") not in session.files_modified:
@@ -805,8 +822,8 @@ LESSONS FROM PAST FAILURES (avoid these mistakes):
 
         # Add line numbers to code for easier reference
         def add_line_numbers(content: str) -> str:
-            lines = content.split('\n')
-            return '\n'.join(f'{i+1:4d}| {line}' for i, line in enumerate(lines))
+            lines = content.split("\n")
+            return "\n".join(f"{i+1:4d}| {line}" for i, line in enumerate(lines))
 
         code_with_lines = {f: add_line_numbers(c) for f, c in code_contents.items()}
 
@@ -959,47 +976,62 @@ EXAMPLE - to change button text that appears multiple times:
         # Import workers here to avoid circular imports
         from workers import CodeWorker, GitWorker
 
+        git_worker = GitWorker(session, self.codebase_path)
+        code_worker = CodeWorker(session, self.codebase_path, self.client, self.model)
+
         try:
             # Create a branch for this fix
-            git_worker = GitWorker(session, self.codebase_path)
             branch_name = await git_worker.create_branch(session.issue)
             session.branch_name = branch_name
 
             # Apply each step
-            code_worker = CodeWorker(
-                session, self.codebase_path, self.client, self.model
-            )
 
             edit_attempted = 0
             edit_succeeded = 0
             failed_edits = []
+            pending_edits = []
 
-            for step in strategy.steps:
-                action = step.get("action")
-
-                if action == "edit_file":
-                    edit_attempted += 1
-                    success = await code_worker.edit_file(
-                        file=step.get("file"),
-                        old_code=step.get("old_code"),
-                        new_code=step.get("new_code"),
-                        description=step.get("description", ""),
-                    )
+            async def flush_edits():
+                """Apply queued consecutive edits to one file in a single read/write."""
+                nonlocal edit_succeeded
+                if not pending_edits:
+                    return
+                results = await code_worker.edit_file_batch(
+                    pending_edits[0].get("file"), pending_edits
+                )
+                for edit_step, success in zip(pending_edits, results):
                     if success:
                         edit_succeeded += 1
-                        session.files_modified.append(step.get("file"))
+                        session.files_modified.append(edit_step.get("file"))
                     else:
                         failed_edits.append(
-                            f"{step.get('file')}: {step.get('description', 'edit failed')}"
+                            f"{edit_step.get('file')}: {edit_step.get('description', 'edit failed')}"
                         )
+                pending_edits.clear()
 
-                elif action == "add_test":
+            for step in strategy.steps:
+                action = step.get("action")
+
+                if action == "edit_file":
+                    edit_attempted += 1
+                    if pending_edits and pending_edits[0].get("file") != step.get(
+                        "file"
+                    ):
+                        await flush_edits()
+                    pending_edits.append(step)
+                    continue
+
+                await flush_edits()
+
+                if action == "add_test":
                     success = await code_worker.add_test(
                         file=step.get("file"), code=step.get("code")
                     )
                     if success:
                         session.files_modified.append(step.get("file"))
 
+            await flush_edits()
+
             # Require at least one edit_file to succeed (not just test additions)
             if edit_attempted > 0 and edit_succeeded == 0:
                 session.error_message = f"All {edit_attempted} edit(s) failed: {'; '.join(failed_edits[:3])}"
@@ -1008,7 +1040,9 @@ EXAMPLE - to change button text that appears multiple times:
 
             # If no edits were attempted, the strategy was incomplete
             if edit_attempted == 0:
-                session.error_message = "Strategy had no edit_file actions - incomplete strategy generation"
+                session.error_message = (
+                    "Strategy had no edit_file actions - incomplete strategy generation"
+                )
                 logger.error(f"Implementation failed: {session.error_message}")
                 return False
 
@@ -1018,19 +1052,24 @@ EXAMPLE - to change button text that appears multiple times:
             logger.exception(f"Error implementing fix: {e}")
             session.error_message = str(e)
             return False
+        finally:
+            await git_worker.close()
+            await code_worker.close()
 
     async def run_tests(self, session: FixSession) -> bool:
         """Run tests to verify the fix."""
         from workers import TestWorker
 
+        test_worker = TestWorker(session, self.codebase_path)
         try:
-            test_worker = TestWorker(session, self.codebase_path)
             result = await test_worker.run_all_tests()
             return result.all_passed
 
         except Exception as e:
             logger.exception(f"Error running tests: {e}")
             return False
+        finally:
+            await test_worker.close()
 
     async def create_pull_request(
         self, session: FixSession, strategy: FixStrategy
@@ -1038,9 +1077,8 @@ EXAMPLE - to change button text that appears multiple times:
         """Create a pull request for the fix."""
         from workers import GitWorker
 
+        git_worker = GitWorker(session, self.codebase_path)
         try:
-            git_worker = GitWorker(session, self.codebase_path)
-
             # Commit changes
             commit_msg = f"fix: {session.issue.title}\n\n{strategy.description}"
             await git_worker.commit_changes(commit_msg, session.files_modified)
@@ -1075,50 +1113,61 @@ EXAMPLE - to change button text that appears multiple times:
         except Exception as e:
             logger.exception(f"Error creating PR: {e}")
             return None
+        finally:
+            await git_worker.close()
 
     async def deploy(self, session: FixSession) -> bool:
         """Deploy the fix."""
         from workers import DockerWorker
 
+        docker_worker = DockerWorker(session)
         try:
-            docker_worker = DockerWorker(session)
             result = await docker_worker.rebuild_and_deploy()
             return result.success
 
         except Exception as e:
             logger.exception(f"Error deploying: {e}")
             return False
+        finally:
+            await docker_worker.close()
 
     async def validate_fix(self, session: FixSession) -> bool:
         """Validate the fix by re-running the test agent."""
         from workers import TestWorker
 
+        test_worker = TestWorker(session, self.codebase_path)
         try:
-            test_worker = TestWorker(session, self.codebase_path)
             return await test_worker.validate_issue_fixed(session.issue)
 
         except Exception as e:
             logger.exception(f"Error validating fix: {e}")
             return False
+        finally:
+            await test_worker.close()
 
     async def rollback(self, session: FixSession):
         """Rollback a failed fix."""
         from workers import GitWorker, DockerWorker
 
+        git_worker = GitWorker(session, self.codebase_path)
         try:
             # Git rollback
-            git_worker = GitWorker(session, self.codebase_path)
             await git_worker.rollback(session.branch_name)
 
             # Docker rollback if deployed
             if session.status in (FixStatus.DEPLOYING, FixStatus.VALIDATING):
                 docker_worker = DockerWorker(session)
-                await docker_worker.rollback()
+                try:
+                    await docker_worker.rollback()
+                finally:
+                    await docker_worker.close()
 
             logger.info(f"Rolled back session {session.id}")
 
         except Exception as e:
             logger.exception(f"Error rolling back: {e}")
+        finally:
+            await git_worker.close()
 
     async def _query_claude(
         self,
@@ -1188,7 +1237,15 @@ EXAMPLE - to change button text that appears multiple times:
         issue_text = f"{issue.title} {issue.description}".lower()
         if issue.category == "ux" or any(
             keyword in issue_text
-            for keyword in ["title", "header", "footer", "nav", "style", "css", "layout"]
+            for keyword in [
+                "title",
+                "header",
+                "footer",
+                "nav",
+                "style",
+                "css",
+                "layout",
+            ]
         ):
             key_files.extend(["templates/base.html"])
 
@@ -18,10 +18,15 @@ from database import Database
 from config import TEST_USERS
 
 
+# Password salt - read once at import, like DB_PATH below
+_SALT_BYTES = os.environ.get("PASSWORD_SALT", "family-video-archive").encode("utf-8")
+
+
 def hash_password(password: str) -> str:
     """Hash a password using SHA-256 with salt (matches app.py)"""
-    salt = os.environ.get("PASSWORD_SALT", "family-video-archive")
-    return hashlib.sha256(f"{salt}{password}".encode()).hexdigest()
+    h = hashlib.sha256(_SALT_BYTES)
+    h.update(password.encode("utf-8"))
+    return h.hexdigest()
 
 
 # Database path - adjust if running remotely
@@ -45,22 +45,34 @@ async def test_connection():
         print(f"  Bot ID: {client.user.id}")
         print(f"  Guilds: {len(client.guilds)}")
 
-        for guild in client.guilds:
-            print(f"\n  Server: {guild.name} (ID: {guild.id})")
+        async def probe(guild):
+            """Check one guild's #bugs channel; returns lines to print."""
+            lines = [f"\n  Server: {guild.name} (ID: {guild.id})"]
 
             # Check if we can see the configured channels
             bugs_channel = guild.get_channel(DISCORD_CHANNEL_IDS.get("bugs", 0))
             if bugs_channel:
-                print(f"    ✓ Found #bugs channel: {bugs_channel.name}")
+                lines.append(f"    ✓ Found #bugs channel: {bugs_channel.name}")
 
                 # Try to send a test message
                 try:
                     await bugs_channel.send("🤖 **Mastermind Bot Connected**\nBot connection test successful!")
-                    print("    ✓ Sent test message to #bugs")
+                    lines.append("    ✓ Sent test message to #bugs")
                 except Exception as e:
-                    print(f"    ✗ Could not send message: {e}")
+                    lines.append(f"    ✗ Could not send message: {e}")
             else:
-                print(f"    ✗ Could not find bugs channel (ID: {DISCORD_CHANNEL_IDS.get('bugs')})")
+                lines.append(f"    ✗ Could not find bugs channel (ID: {DISCORD_CHANNEL_IDS.get('bugs')})")
+
+            return lines
+
+        # Probe all guilds concurrently, then print results in guild order
+        results = await asyncio.gather(*(probe(guild) for guild in client.guilds), return_exceptions=True)
+        for guild, lines in zip(client.guilds, results):
+            if isinstance(lines, Exception):
+                print(f"\n  Server: {guild.name} (ID: {guild.id})")
+                print(f"    ✗ Probe failed: {lines}")
+            else:
+                print("\n".join(lines))
 
         success = True
         connected.set()
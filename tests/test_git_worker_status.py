@@ -0,0 +1,76 @@
+"""
+GitWorker.get_status must report the same buckets with pygit2 and the git CLI.
+"""
+
+import shutil
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from workers import git_worker
+from workers.git_worker import GitWorker
+
+
+def _git(repo: Path, *args: str):
+    subprocess.run(["git", *args], cwd=repo, check=True, capture_output=True)
+
+
+@unittest.skipIf(shutil.which("git") is None, "git is not installed")
+@unittest.skipIf(git_worker.pygit2 is None, "pygit2 is not installed")
+class GetStatusBackendsTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.repo = Path(self._tmp.name)
+        _git(self.repo, "init", "-q")
+        _git(self.repo, "config", "user.email", "test@example.com")
+        _git(self.repo, "config", "user.name", "Test")
+        for name in ("renamed.py", "renamed_then_edited.py", "modified.py", "deleted.py", "staged.py"):
+            # Distinct, long enough content for git's rename detection
+            (self.repo / name).write_text("".join(f"{name} line {i}\n" for i in range(20)))
+        _git(self.repo, "add", ".")
+        _git(self.repo, "commit", "-q", "-m", "initial")
+
+        _git(self.repo, "mv", "renamed.py", "renamed_new.py")
+        _git(self.repo, "mv", "renamed_then_edited.py", "edited_new.py")
+        with open(self.repo / "edited_new.py", "a") as f:
+            f.write("edited\n")
+        with open(self.repo / "modified.py", "a") as f:
+            f.write("modified\n")
+        with open(self.repo / "staged.py", "a") as f:
+            f.write("staged\n")
+        _git(self.repo, "add", "staged.py")
+        (self.repo / "deleted.py").unlink()
+        (self.repo / "added.py").write_text("added\n")
+        _git(self.repo, "add", "added.py")
+        (self.repo / "untracked.py").write_text("untracked\n")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    async def _status(self, use_pygit2: bool) -> dict:
+        worker = GitWorker(None, self.repo)
+        try:
+            if use_pygit2:
+                status = await worker.get_status()
+            else:
+                with mock.patch.object(git_worker, "pygit2", None):
+                    status = await worker.get_status()
+        finally:
+            await worker.close()
+        return {bucket: sorted(files) for bucket, files in status.items()}
+
+    async def test_backends_agree(self):
+        expected = {
+            "modified": ["modified.py", "staged.py"],
+            "added": ["added.py", "edited_new.py", "renamed_new.py"],
+            "deleted": ["deleted.py", "renamed.py", "renamed_then_edited.py"],
+            "untracked": ["untracked.py"],
+        }
+        self.assertEqual(await self._status(use_pygit2=True), expected)
+        self.assertEqual(await self._status(use_pygit2=False), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
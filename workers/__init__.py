@@ -6,13 +6,21 @@ Workers handle specific tasks:
 - GitWorker: Git operations (branch, commit, PR)
 - DockerWorker: Docker operations (build, deploy)
 - TestWorker: Run tests and validation
+
+Worker classes are imported lazily on first access, so importing this
+package doesn't pull in every worker's dependencies (aiohttp, difflib, ...).
 """
 
-from .base_worker import BaseWorker
-from .code_worker import CodeWorker
-from .git_worker import GitWorker
-from .docker_worker import DockerWorker
-from .test_worker import TestWorker
+import importlib
+
+# Exported name -> submodule that defines it
+_LAZY = {
+    "BaseWorker": ".base_worker",
+    "CodeWorker": ".code_worker",
+    "GitWorker": ".git_worker",
+    "DockerWorker": ".docker_worker",
+    "TestWorker": ".test_worker",
+}
 
 __all__ = [
     "BaseWorker",
@@ -21,3 +29,16 @@ __all__ = [
     "DockerWorker",
     "TestWorker",
 ]
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        module = importlib.import_module(_LAZY[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
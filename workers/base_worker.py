@@ -4,8 +4,12 @@ Base Worker - Common functionality for all workers
 
 import asyncio
 import logging
+import os
+import shlex
+import signal
+import uuid
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterator, Optional, Sequence, Tuple, Union
 from dataclasses import dataclass
 
 logger = logging.getLogger(__name__)
@@ -28,6 +32,10 @@ class BaseWorker:
     Provides common functionality like command execution and logging.
     """
 
+    # Run shell-string commands through one long-lived bash per worker rather
+    # than spawning a fresh /bin/sh for every call
+    use_persistent_shell = True
+
     def __init__(self, session, codebase_path: Optional[Path] = None):
         """
         Initialize the worker.
@@ -40,60 +48,337 @@ class BaseWorker:
 
         self.session: FixSession = session
         self.codebase_path = codebase_path or Path("/home/dev/family_archive")
+        self._shell: Optional[asyncio.subprocess.Process] = None
+        self._shell_lock: Optional[asyncio.Lock] = None
 
     def log(self, message: str, level: str = "info"):
         """Log a message."""
         log_fn = getattr(logger, level, logger.info)
         log_fn(f"[{self.__class__.__name__}] {message}")
 
-    async def run_command(self, command: str, cwd: Optional[Path] = None, timeout: int = 300) -> WorkerResult:
+    async def run_command(
+        self,
+        command: Union[str, Sequence[str]],
+        cwd: Optional[Path] = None,
+        timeout: int = 300,
+        input: Optional[bytes] = None,
+    ) -> WorkerResult:
         """
-        Run a shell command asynchronously.
+        Run a command asynchronously.
 
         Args:
-            command: Command to run
+            command: Shell command string, or an argv list to exec directly
+                (no shell, so arguments are never interpolated)
             cwd: Working directory (defaults to codebase path)
             timeout: Timeout in seconds
+            input: Bytes to send to the command's stdin (stdin is otherwise empty)
 
         Returns:
             WorkerResult with success status and output
         """
         cwd = cwd or self.codebase_path
 
-        self.log(f"Running: {command}")
+        if isinstance(command, str):
+            self.log(f"Running: {command}")
+        else:
+            self.log(f"Running: {shlex.join(command)}")
 
         try:
-            proc = await asyncio.create_subprocess_shell(
-                command,
-                cwd=str(cwd),
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
+            output = None
+            if isinstance(command, str) and self.use_persistent_shell and input is None:
+                output = await self._run_in_shell(command, cwd, timeout)
 
-            try:
-                stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
-            except asyncio.TimeoutError:
-                proc.kill()
-                return WorkerResult(success=False, error=f"Command timed out after {timeout}s")
+            if output is None:
+                stdin = asyncio.subprocess.PIPE if input is not None else None
+                if isinstance(command, str):
+                    proc = await asyncio.create_subprocess_shell(
+                        command,
+                        cwd=str(cwd),
+                        stdin=stdin,
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.PIPE,
+                    )
+                else:
+                    proc = await asyncio.create_subprocess_exec(
+                        *command,
+                        cwd=str(cwd),
+                        stdin=stdin,
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.PIPE,
+                    )
+
+                try:
+                    if input is not None:
+                        stdout, stderr = await asyncio.wait_for(proc.communicate(input), timeout=timeout)
+                    else:
+                        stdout, stderr, _ = await asyncio.wait_for(
+                            asyncio.gather(
+                                self._read_stream(proc.stdout),
+                                self._read_stream(proc.stderr),
+                                proc.wait(),
+                            ),
+                            timeout=timeout,
+                        )
+                except asyncio.TimeoutError:
+                    proc.kill()
+                    return WorkerResult(success=False, error=f"Command timed out after {timeout}s")
+
+                returncode = proc.returncode
+            else:
+                returncode, stdout, stderr = output
 
             stdout_str = stdout.decode().strip()
             stderr_str = stderr.decode().strip()
 
-            if proc.returncode != 0:
-                return WorkerResult(
-                    success=False, message=stdout_str, error=stderr_str or f"Exit code {proc.returncode}"
-                )
+            if returncode != 0:
+                return WorkerResult(success=False, message=stdout_str, error=stderr_str or f"Exit code {returncode}")
 
             return WorkerResult(success=True, message=stdout_str)
 
+        except asyncio.TimeoutError:
+            return WorkerResult(success=False, error=f"Command timed out after {timeout}s")
         except Exception as e:
             return WorkerResult(success=False, error=str(e))
 
+    async def _read_stream(self, stream: asyncio.StreamReader) -> bytearray:
+        """Read a pipe to EOF into a single buffer."""
+        buffer = bytearray()
+        while True:
+            chunk = await stream.read(65536)
+            if not chunk:
+                return buffer
+            buffer += chunk
+
+    async def stream_command(
+        self,
+        command: Union[str, Sequence[str]],
+        cwd: Optional[Path] = None,
+        timeout: int = 300,
+        status: Optional[WorkerResult] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Run a command and yield its stdout line by line as it is produced.
+
+        Unlike run_command, the full output is never buffered. Closing the
+        generator early (e.g. with aclose() after enough lines) kills the
+        process. Lines longer than 1 MiB are skipped. If the command can't be
+        started, the error is logged and nothing is yielded.
+
+        Args:
+            command: Shell command string, or an argv list to exec directly
+            cwd: Working directory (defaults to codebase path)
+            timeout: Overall timeout in seconds; output stops when exceeded
+            status: If given, filled in like run_command's result (success
+                and error from the exit code and stderr, plus
+                data["returncode"]) once the output is exhausted. Left
+                untouched if the generator is closed early. Without it,
+                stderr is discarded and the exit code ignored.
+        """
+        cwd = cwd or self.codebase_path
+        stderr = asyncio.subprocess.PIPE if status is not None else asyncio.subprocess.DEVNULL
+
+        try:
+            if isinstance(command, str):
+                self.log(f"Streaming: {command}")
+                proc = await asyncio.create_subprocess_shell(
+                    command,
+                    cwd=str(cwd),
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=stderr,
+                    limit=1024 * 1024,
+                    start_new_session=True,
+                )
+            else:
+                self.log(f"Streaming: {shlex.join(command)}")
+                proc = await asyncio.create_subprocess_exec(
+                    *command,
+                    cwd=str(cwd),
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=stderr,
+                    limit=1024 * 1024,
+                    start_new_session=True,
+                )
+        except OSError as e:
+            self.log(f"Could not start command: {e}", "error")
+            if status is not None:
+                status.success = False
+                status.error = str(e)
+            return
+
+        # Drain stderr alongside stdout so a chatty command can't block on it
+        stderr_task = asyncio.ensure_future(self._read_stream(proc.stderr)) if status is not None else None
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+
+        try:
+            while True:
+                try:
+                    line = await asyncio.wait_for(proc.stdout.readline(), timeout=deadline - loop.time())
+                except ValueError:
+                    # Line exceeded the buffer limit; the reader has dropped it
+                    continue
+                except asyncio.TimeoutError:
+                    self.log(f"Command timed out after {timeout}s", "warning")
+                    if status is not None:
+                        status.success = False
+                        status.error = f"Command timed out after {timeout}s"
+                    break
+                if not line:
+                    if status is not None:
+                        await proc.wait()
+                        stderr_str = (await stderr_task).decode(errors="replace").strip()
+                        status.success = proc.returncode == 0
+                        status.error = None if status.success else stderr_str or f"Exit code {proc.returncode}"
+                        status.data = {"returncode": proc.returncode}
+                    break
+                yield line.decode(errors="replace").rstrip("\n")
+        finally:
+            if proc.returncode is None:
+                try:
+                    if hasattr(os, "killpg"):
+                        # The whole process group, so children a shell forked
+                        # can't keep the pipes (and proc.wait()) open. Not
+                        # proc.kill(): it polls first, which can reap the
+                        # child behind the event loop's child watcher
+                        os.killpg(proc.pid, signal.SIGKILL)
+                    else:
+                        proc.kill()
+                except ProcessLookupError:
+                    pass
+            await proc.wait()
+            if stderr_task is not None and not stderr_task.done():
+                # Stopped early - a leftover grandchild may still hold stderr open
+                stderr_task.cancel()
+
+    async def _run_in_shell(self, command: str, cwd: Path, timeout: int) -> Optional[Tuple[int, bytes, bytes]]:
+        """
+        Run a command through this worker's persistent bash process.
+
+        Each command runs in a subshell (so cd/exports don't leak between
+        calls) and is followed by a unique marker carrying its exit code.
+
+        Returns (returncode, stdout, stderr), or None if the shell is
+        unavailable or already busy - the caller then uses a one-off
+        subprocess, so concurrent commands still run in parallel.
+        Raises asyncio.TimeoutError after killing the shell on timeout.
+        """
+        if self._shell_lock is None:
+            self._shell_lock = asyncio.Lock()
+        if self._shell_lock.locked():
+            return None
+
+        async with self._shell_lock:
+            shell = await self._get_shell()
+            if shell is None:
+                return None
+
+            marker = f"__MASTERMIND_END_{uuid.uuid4().hex}__"
+            script = (
+                f"( cd {shlex.quote(str(cwd))} && eval {shlex.quote(command)} ) </dev/null\n"
+                f"printf '\\n{marker}%d\\n' $?\n"
+                f"printf '\\n{marker}\\n' >&2\n"
+            )
+
+            try:
+                shell.stdin.write(script.encode())
+                await shell.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                # Shell died before the command was sent - safe to retry elsewhere
+                await self._close_shell()
+                return None
+
+            try:
+                (stdout, code), (stderr, _) = await asyncio.wait_for(
+                    asyncio.gather(
+                        self._read_until_marker(shell.stdout, marker),
+                        self._read_until_marker(shell.stderr, marker),
+                    ),
+                    timeout=timeout,
+                )
+            except BaseException:
+                await self._close_shell()
+                raise
+
+            return int(code or -1), stdout, stderr
+
+    async def _read_until_marker(self, stream: asyncio.StreamReader, marker: str) -> Tuple[bytes, str]:
+        """Read a stream up to the end-of-command marker line, returning (output, marker suffix)."""
+        token = f"\n{marker}".encode()
+        buffer = bytearray()
+
+        while True:
+            search_from = max(0, len(buffer) - len(token))
+            chunk = await stream.read(65536)
+            if not chunk:
+                raise ConnectionResetError("Persistent shell exited unexpectedly")
+            buffer += chunk
+
+            idx = buffer.find(token, search_from)
+            if idx < 0:
+                continue
+            end = buffer.find(b"\n", idx + len(token))
+            while end < 0:
+                chunk = await stream.read(64)
+                if not chunk:
+                    raise ConnectionResetError("Persistent shell exited unexpectedly")
+                buffer += chunk
+                end = buffer.find(b"\n", idx + len(token))
+            return bytes(buffer[:idx]), buffer[idx + len(token) : end].decode()
+
+    async def _get_shell(self) -> Optional[asyncio.subprocess.Process]:
+        """Return the persistent shell, starting it if needed."""
+        if self._shell is not None and self._shell.returncode is None:
+            return self._shell
+
+        try:
+            self._shell = await asyncio.create_subprocess_exec(
+                "bash",
+                "--noprofile",
+                "--norc",
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True,
+            )
+        except OSError as e:
+            self.log(f"Persistent shell unavailable ({e}), using one-off subprocesses", "warning")
+            self.use_persistent_shell = False
+            self._shell = None
+
+        return self._shell
+
+    async def _close_shell(self):
+        """Kill the persistent shell and anything it is running."""
+        shell, self._shell = self._shell, None
+        if shell is None or shell.returncode is not None:
+            return
+        try:
+            if hasattr(os, "killpg"):
+                os.killpg(shell.pid, signal.SIGKILL)
+            else:
+                shell.kill()
+        except ProcessLookupError:
+            pass
+        await shell.wait()
+
+    async def close(self):
+        """Shut down the persistent shell, if one was started."""
+        shell, self._shell = self._shell, None
+        if shell is None or shell.returncode is not None:
+            return
+        shell.stdin.close()
+        try:
+            await asyncio.wait_for(shell.wait(), timeout=5)
+        except asyncio.TimeoutError:
+            self._shell = shell
+            await self._close_shell()
+
     async def read_file(self, file_path: str) -> Optional[str]:
         """Read a file from the codebase."""
         full_path = self.codebase_path / file_path
         try:
-            return full_path.read_text(encoding="utf-8")
+            # Run disk I/O off the event loop so concurrent workers overlap
+            return await asyncio.to_thread(full_path.read_text, encoding="utf-8")
         except FileNotFoundError:
             self.log(f"File not found: {file_path}", "warning")
             return None
@@ -106,9 +391,9 @@ class BaseWorker:
         full_path = self.codebase_path / file_path
         try:
             # Create parent directories if needed
-            full_path.parent.mkdir(parents=True, exist_ok=True)
+            await asyncio.to_thread(full_path.parent.mkdir, parents=True, exist_ok=True)
             # Use UTF-8 encoding to handle emojis and special characters
-            full_path.write_text(content, encoding="utf-8")
+            await asyncio.to_thread(full_path.write_text, content, encoding="utf-8")
             self.log(f"Wrote {len(content)} bytes to {file_path}")
             return True
         except Exception as e:
@@ -117,4 +402,4 @@ class BaseWorker:
 
     async def file_exists(self, file_path: str) -> bool:
         """Check if a file exists."""
-        return (self.codebase_path / file_path).exists()
+        return await asyncio.to_thread((self.codebase_path / file_path).exists)
@@ -2,12 +2,143 @@
 Code Worker - Read and write code with Claude assistance
 """
 
+import ast
+import asyncio
 import difflib
+import hashlib
+import json
+import os
+import random
 import re
+import shutil
+import sqlite3
+import time
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional, List, Tuple
 
-from .base_worker import BaseWorker
+import anthropic
+
+try:
+    # Optional: C implementation of the fuzzy-match similarity score
+    from rapidfuzz import fuzz as rapidfuzz_fuzz
+except ImportError:
+    rapidfuzz_fuzz = None
+
+from .base_worker import BaseWorker, WorkerResult
+
+# JSON object inside a ``` or ```json fence, ignoring any surrounding prose
+_JSON_BLOCK_RE = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL)
+
+# Identifier-like words in an issue description, matched against definition names
+_IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]{2,}")
+
+
+@lru_cache(maxsize=128)
+def _function_pattern(function_name: str) -> re.Pattern:
+    """Compiled regex for a function/method definition (non-Python fallback)."""
+    return re.compile(
+        rf"((?:async\s+)?def\s+{re.escape(function_name)}\s*\([^)]*\)[^:]*:.*?)(?=\n(?:async\s+)?def\s|\nclass\s|\Z)",
+        re.DOTALL,
+    )
+
+
+@lru_cache(maxsize=128)
+def _class_pattern(class_name: str) -> re.Pattern:
+    """Compiled regex for a class definition (non-Python fallback)."""
+    return re.compile(
+        rf"(class\s+{re.escape(class_name)}\s*(?:\([^)]*\))?:.*?)(?=\nclass\s|\Z)",
+        re.DOTALL,
+    )
+
+
+def _newline_index(content: str) -> List[int]:
+    """
+    Offsets of every newline in content, bracketed by -1 and len(content).
+
+    With nl = _newline_index(content), line i is content[nl[i] + 1 : nl[i + 1]]
+    and lines [i, j) are content[nl[i] + 1 : nl[j]] - a single slice instead
+    of re-joining a list of lines. Matches content.split("\n") line numbering.
+    """
+    nl = [-1]
+    pos = content.find("\n")
+    while pos >= 0:
+        nl.append(pos)
+        pos = content.find("\n", pos + 1)
+    nl.append(len(content))
+    return nl
+
+
+def _parse_python(content: str) -> Optional[ast.Module]:
+    """Parse Python source, returning None if it isn't valid Python."""
+    try:
+        return ast.parse(content)
+    except (SyntaxError, ValueError):
+        return None
+
+
+def _find_ast_definition(content: str, tree: ast.Module, node_types: tuple, name: str) -> Optional[str]:
+    """Find a definition by name in a parsed module and return its exact source."""
+    for node in ast.walk(tree):
+        if isinstance(node, node_types) and node.name == name:
+            return ast.get_source_segment(content, node)
+
+    return None
+
+
+class FixCache:
+    """
+    Disk-backed cache of generate_fix responses.
+
+    Uses SQLite (like CostTracker) so identical requests for unchanged files
+    skip the Claude call across retries and restarts.
+    """
+
+    def __init__(self, db_path: Optional[Path] = None, ttl_seconds: int = 86400):
+        self.db_path = db_path or Path(__file__).parent.parent / "data" / "fix_cache.db"
+        self.ttl_seconds = ttl_seconds
+        self._initialized = False
+
+    def _init_db(self):
+        """Initialize the database schema."""
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS fix_cache (
+                    key TEXT PRIMARY KEY,
+                    created REAL NOT NULL,
+                    fix TEXT NOT NULL
+                )
+            """
+            )
+            conn.commit()
+        self._initialized = True
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return the cached fix for key, or None if missing or expired."""
+        if not self._initialized:
+            self._init_db()
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT fix FROM fix_cache WHERE key = ? AND created > ?",
+                (key, time.time() - self.ttl_seconds),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, fix: dict):
+        """Store a fix, dropping expired entries."""
+        if not self._initialized:
+            self._init_db()
+        now = time.time()
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("DELETE FROM fix_cache WHERE created <= ?", (now - self.ttl_seconds,))
+            conn.execute(
+                "INSERT OR REPLACE INTO fix_cache (key, created, fix) VALUES (?, ?, ?)",
+                (key, now, json.dumps(fix)),
+            )
+            conn.commit()
 
 
 class CodeWorker(BaseWorker):
@@ -17,10 +148,54 @@ class CodeWorker(BaseWorker):
     Uses Claude for generating code changes when needed.
     """
 
+    # Shared across workers: bounds concurrent generate_fix calls to Claude
+    MAX_CONCURRENT_CLAUDE_CALLS = 4
+    CLAUDE_RETRIES = 3
+    _claude_semaphore: Optional[asyncio.Semaphore] = None
+    fix_cache = FixCache()
+    CONTENT_CACHE_SIZE = 32
+    # Most file content sent to Claude in a generate_fix prompt
+    PROMPT_CODE_CHARS = 10000
+    PROMPT_HEADER_LINES = 30
+    # Longest matched line search_codebase returns whole; longer (e.g.
+    # minified) lines are cut to a preview of this many characters
+    SEARCH_MAX_COLUMNS = 500
+
     def __init__(self, session, codebase_path: Path, claude_client, model: str):
         super().__init__(session, codebase_path)
         self.claude = claude_client
         self.model = model
+        # file -> ((mtime_ns, size), content); LRU of recently read files
+        self._content_cache: "OrderedDict[str, Tuple[Tuple[int, int], str]]" = OrderedDict()
+
+    async def read_file(self, file_path: str) -> Optional[str]:
+        """Read a file, reusing the cached content while its mtime and size are unchanged."""
+        try:
+            # stat off the event loop, like the read itself
+            stat = await asyncio.to_thread(os.stat, self.codebase_path / file_path)
+        except OSError:
+            self._content_cache.pop(file_path, None)
+            return await super().read_file(file_path)
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        cached = self._content_cache.get(file_path)
+        if cached is not None and cached[0] == version:
+            self._content_cache.move_to_end(file_path)
+            return cached[1]
+
+        content = await super().read_file(file_path)
+        if content is not None:
+            self._content_cache[file_path] = (version, content)
+            self._content_cache.move_to_end(file_path)
+            while len(self._content_cache) > self.CONTENT_CACHE_SIZE:
+                self._content_cache.popitem(last=False)
+        return content
+
+    async def write_file(self, file_path: str, content: str) -> bool:
+        """Write a file and drop its cached content."""
+        # Invalidate even on failure - a partial write may have changed the file
+        self._content_cache.pop(file_path, None)
+        return await super().write_file(file_path, content)
 
     async def edit_file(
         self, file: str, old_code: str, new_code: str, description: str = ""
@@ -50,42 +225,99 @@ class CodeWorker(BaseWorker):
             self.log(f"Cannot read file: {file}", "error")
             return False
 
-        # Strategy 1: Exact match
-        if old_code in content:
-            occurrences = content.count(old_code)
-            if occurrences > 1:
-                self.log(
-                    f"old_code appears {occurrences} times - need unique match", "error"
-                )
-                return False
-            new_content = content.replace(old_code, new_code, 1)
-            if new_content != content:
-                return await self.write_file(file, new_content)
+        new_content = self._apply_edit(file, content, old_code, new_code, description)
+        if new_content is None:
+            return False
 
-        # Strategy 2: Whitespace-normalized match
-        normalized_match = self._find_whitespace_normalized(content, old_code)
-        if normalized_match:
-            self.log(f"Found whitespace-normalized match")
-            new_content = content.replace(normalized_match, new_code, 1)
-            if new_content != content:
-                return await self.write_file(file, new_content)
-
-        # Strategy 2.5: Case-insensitive match (common issue with button text)
-        case_match = self._find_case_insensitive_match(content, old_code, new_code)
-        if case_match:
-            actual_old, adjusted_new = case_match
-            self.log(f"Found case-insensitive match: '{actual_old[:50]}...'")
-            new_content = content.replace(actual_old, adjusted_new, 1)
-            if new_content != content:
-                return await self.write_file(file, new_content)
+        return await self.write_file(file, new_content)
 
-        # Strategy 2.6: Context-aware match using description hints
-        context_match = self._find_context_aware_match(
-            content, old_code, new_code, description
-        )
-        if context_match:
-            self.log(f"Found context-aware match using description hints")
-            return await self.write_file(file, context_match)
+    async def edit_file_batch(self, file: str, edits: List[dict]) -> List[bool]:
+        """
+        Apply several edits to one file with a single read and write.
+
+        Each edit is applied in order to the in-memory content, using the
+        same strategies as edit_file, so later edits see earlier ones.
+
+        Args:
+            file: Path to the file
+            edits: List of {old_code, new_code, description} dicts
+
+        Returns:
+            Per-edit success flags, in the same order as edits
+        """
+        self.log(f"Editing {file}: {len(edits)} edit(s)")
+
+        content = await self.read_file(file)
+        if content is None:
+            self.log(f"Cannot read file: {file}", "error")
+            return [False] * len(edits)
+
+        results = []
+        for edit in edits:
+            description = edit.get("description", "")
+            self.log(f"Applying edit to {file}: {description}")
+            new_content = self._apply_edit(file, content, edit.get("old_code"), edit.get("new_code"), description)
+            if new_content is None:
+                results.append(False)
+            else:
+                content = new_content
+                results.append(True)
+
+        if any(results) and not await self.write_file(file, content):
+            return [False] * len(edits)
+
+        return results
+
+    def _apply_edit(self, file: str, content: str, old_code: str, new_code: str, description: str) -> Optional[str]:
+        """
+        Replace old_code with new_code in content using the edit strategies.
+
+        Returns the new content, or None if no strategy found a match.
+        """
+        # Strategy 1: Exact match (find + splice, stopping at a second hit)
+        pos = content.find(old_code)
+        if pos >= 0:
+            if content.find(old_code, pos + 1) >= 0:
+                self.log("old_code appears multiple times - need unique match", "error")
+                return None
+            new_content = content[:pos] + new_code + content[pos + len(old_code) :]
+            if new_content != content:
+                return new_content
+
+        # Strategies 2-2.6 and 4 all need at least one line of old_code to be
+        # present (ignoring case and whitespace), so skip them for the common
+        # "wrong file" / hallucinated snippet case.
+        anchored = self._has_anchor_line(content, old_code)
+
+        if anchored:
+            # Strategy 2: Whitespace-normalized match
+            normalized_match = self._find_whitespace_normalized(content, old_code)
+            if normalized_match:
+                self.log(f"Found whitespace-normalized match")
+                new_content = content.replace(normalized_match, new_code, 1)
+                if new_content != content:
+                    return new_content
+
+            # Strategy 2.5: Case-insensitive match (common issue with button text)
+            case_match = self._find_case_insensitive_match(content, old_code, new_code)
+            if case_match:
+                actual_old, adjusted_new = case_match
+                self.log(f"Found case-insensitive match: '{actual_old[:50]}...'")
+                new_content = content.replace(actual_old, adjusted_new, 1)
+                if new_content != content:
+                    return new_content
+
+            # Strategy 2.6: Context-aware match using description hints
+            context_match = self._find_context_aware_match(content, old_code, new_code, description)
+            if context_match:
+                self.log(f"Found context-aware match using description hints")
+                return context_match
+
+        # The fuzzy scan can match even when no line is present verbatim
+        # (e.g. "a+b" for "a + b"), so it only needs a similar line
+        if not anchored and not self._has_similar_line(content, old_code):
+            self.log(f"No line of old_code present or similar in {file}", "error")
+            return None
 
         # Strategy 3: Fuzzy match using difflib SequenceMatcher
         fuzzy_match = self._find_fuzzy_match(content, old_code, threshold=0.85)
@@ -95,29 +327,84 @@ class CodeWorker(BaseWorker):
             )
             new_content = content.replace(fuzzy_match[0], new_code, 1)
             if new_content != content:
-                return await self.write_file(file, new_content)
+                return new_content
 
         # Strategy 4: Line anchor matching - find unique identifying lines
-        anchor_match = self._find_by_anchor_lines(content, old_code, new_code)
-        if anchor_match:
-            self.log(f"Found anchor-based match")
-            return await self.write_file(file, anchor_match)
+        if anchored:
+            anchor_match = self._find_by_anchor_lines(content, old_code, new_code)
+            if anchor_match:
+                self.log(f"Found anchor-based match")
+                return anchor_match
 
         self.log(f"Old code not found in {file} using any strategy", "error")
-        return False
+        return None
+
+    def _has_anchor_line(self, content: str, old_code: str) -> bool:
+        """Check whether any significant line of old_code appears in content."""
+        content_normalized = " ".join(content.lower().split())
+        checked = False
+        for line in old_code.splitlines():
+            stripped = line.strip()
+            if not stripped or stripped.startswith(("#", "//")):
+                continue
+            checked = True
+            if " ".join(stripped.lower().split()) in content_normalized:
+                return True
+        # Nothing to anchor on (only comments/blank lines) - don't short-circuit
+        return not checked
+
+    def _has_similar_line(self, content: str, old_code: str, cutoff: float = 0.6) -> bool:
+        """Check whether any significant line of old_code resembles a line of content, ignoring case and whitespace."""
+        content_lines = {"".join(line.lower().split()) for line in content.splitlines()}
+        content_lines.discard("")
+        checked = False
+        for line in old_code.splitlines():
+            stripped = line.strip()
+            if not stripped or stripped.startswith(("#", "//")):
+                continue
+            checked = True
+            key = "".join(stripped.lower().split())
+            if key in content_lines:
+                return True
+            if rapidfuzz_fuzz is not None:
+                if any(rapidfuzz_fuzz.ratio(key, other, score_cutoff=cutoff * 100) for other in content_lines):
+                    return True
+            elif difflib.get_close_matches(key, content_lines, n=1, cutoff=cutoff):
+                return True
+        return not checked
 
     def _find_whitespace_normalized(self, content: str, target: str) -> Optional[str]:
         """Find code by normalizing whitespace differences."""
         target_normalized = " ".join(target.split())
+        target_length = len(target_normalized)
         lines = content.split("\n")
+        nl = _newline_index(content)
+        # Normalize each line once; a window's normalized text is just its
+        # non-empty normalized lines joined by single spaces
+        norm_lines = [" ".join(line.split()) for line in lines]
+
+        # Any matching window is a substring of the whole normalized file,
+        # so one find rules out the common no-match case before the scan
+        if target_normalized not in " ".join(norm for norm in norm_lines if norm):
+            return None
 
         for i in range(len(lines)):
-            for window in range(1, min(30, len(lines) - i + 1)):
-                candidate = "\n".join(lines[i : i + window])
-                candidate_normalized = " ".join(candidate.split())
-
-                if target_normalized == candidate_normalized:
-                    return candidate
+            # Grow the window a line at a time, tracking how much of the
+            # target it matches so far; stop as soon as it diverges
+            matched = 0
+            for j in range(i, min(i + 29, len(lines))):
+                norm = norm_lines[j]
+                if norm:
+                    if matched:
+                        if not target_normalized.startswith(" ", matched):
+                            break
+                        matched += 1
+                    if not target_normalized.startswith(norm, matched):
+                        break
+                    matched += len(norm)
+
+                if matched == target_length:
+                    return content[nl[i] + 1 : nl[j + 1]]
 
         return None
 
@@ -133,28 +420,29 @@ class CodeWorker(BaseWorker):
         Returns (actual_old_code_from_file, adjusted_new_code) or None.
         """
         old_lower = old_code.lower()
-        lines = content.split("\n")
+        content_lower = content.lower()
 
-        # Try to find a line that matches case-insensitively
-        for i, line in enumerate(lines):
-            if old_lower in line.lower():
-                # Found a case-insensitive match in this line
-                # Now find the exact position and extract the actual text
-                line_lower = line.lower()
-                pos = line_lower.find(old_lower)
-                actual_old = line[pos : pos + len(old_code)]
-
-                # Adjust new_code to preserve the original case pattern where possible
-                # If old had "Sign in" but Claude sent "Sign In", adjust new_code too
-                if actual_old != old_code:
-                    # Apply the same case transformation to new_code
-                    adjusted_new = self._apply_case_pattern(old_code, actual_old, new_code)
-                else:
-                    adjusted_new = new_code
+        # Verify uniqueness up front, stopping at a second occurrence rather
+        # than counting them all
+        first = content_lower.find(old_lower)
+        if first < 0 or content_lower.find(old_lower, first + 1) >= 0:
+            return None
+
+        # Find the line that matches case-insensitively
+        for line in content.split("\n"):
+            pos = line.lower().find(old_lower)
+            if pos < 0:
+                continue
 
-                # Verify uniqueness
-                if content.lower().count(old_lower) == 1:
-                    return (actual_old, adjusted_new)
+            # Extract the actual text at that position
+            actual_old = line[pos : pos + len(old_code)]
+
+            # Nothing to adjust if the case already agrees
+            if actual_old == old_code:
+                return (actual_old, new_code)
+
+            # If old had "Sign in" but Claude sent "Sign In", adjust new_code too
+            return (actual_old, self._apply_case_pattern(old_code, actual_old, new_code))
 
         return None
 
@@ -165,34 +453,26 @@ class CodeWorker(BaseWorker):
         If expected was "Sign In" but actual was "Sign in",
         transform new_text accordingly.
         """
-        # Find the differences and apply them
-        result = list(new_text)
-
-        for i, (exp_char, act_char) in enumerate(zip(expected, actual)):
-            if exp_char.lower() == act_char.lower() and exp_char != act_char:
-                # Case difference found - find this char in new_text and adjust
-                # This is simplified - in practice we'd need smarter matching
-                pass
-
         # Simplified approach: if there's a simple pattern like "Sign In" -> "Sign in"
         # just do a case-insensitive replace
-        if expected.lower() in new_text.lower():
-            # Find where the expected text appears in new_text
-            start = new_text.lower().find(expected.lower())
-            if start >= 0:
-                # Preserve the actual case pattern
-                old_in_new = new_text[start : start + len(expected)]
-                # Apply actual's case to the matching portion
-                adjusted = ""
-                for i, (n_char, a_char) in enumerate(
-                    zip(old_in_new, actual + " " * (len(old_in_new) - len(actual)))
-                ):
-                    if i < len(actual) and n_char.lower() == a_char.lower():
-                        adjusted += a_char
-                    else:
-                        adjusted += n_char
-                result = new_text[:start] + adjusted + new_text[start + len(expected) :]
-                return result
+        # Find where the expected text appears in new_text
+        start = new_text.lower().find(expected.lower())
+        if start >= 0:
+            # Preserve the actual case pattern
+            old_in_new = new_text[start : start + len(expected)]
+            if len(old_in_new) == len(actual) and old_in_new.lower() == actual.lower():
+                # The whole segment differs only by case - use actual as-is
+                adjusted = actual
+            else:
+                # Apply actual's case character by character where they agree
+                adjusted = (
+                    "".join(
+                        a_char if n_char.lower() == a_char.lower() else n_char
+                        for n_char, a_char in zip(old_in_new, actual)
+                    )
+                    + old_in_new[len(actual) :]
+                )
+            return new_text[:start] + adjusted + new_text[start + len(expected) :]
 
         return new_text
 
@@ -211,6 +491,7 @@ class CodeWorker(BaseWorker):
         old_lower = old_code.lower()
         desc_lower = description.lower()
         lines = content.split("\n")
+        nl = _newline_index(content)
 
         # Find all lines containing old_code (case-insensitive)
         matches = []
@@ -227,8 +508,7 @@ class CodeWorker(BaseWorker):
             pos = line.lower().find(old_lower)
             actual_old = line[pos : pos + len(old_code)]
             new_line = line[:pos] + new_code + line[pos + len(old_code) :]
-            result_lines = lines[:line_idx] + [new_line] + lines[line_idx + 1 :]
-            return "\n".join(result_lines)
+            return content[: nl[line_idx] + 1] + new_line + content[nl[line_idx + 1] :]
 
         # Multiple matches - use description to disambiguate
         best_match = None
@@ -238,7 +518,7 @@ class CodeWorker(BaseWorker):
             score = 0
             context_start = max(0, line_idx - 5)
             context_end = min(len(lines), line_idx + 5)
-            context = "\n".join(lines[context_start:context_end]).lower()
+            context = content[nl[context_start] + 1 : nl[context_end]].lower()
 
             # Score based on description keywords
             if "main" in desc_lower or "submit" in desc_lower:
@@ -271,8 +551,7 @@ class CodeWorker(BaseWorker):
             pos = line.lower().find(old_lower)
             actual_old = line[pos : pos + len(old_code)]
             new_line = line[:pos] + new_code + line[pos + len(old_code) :]
-            result_lines = lines[:line_idx] + [new_line] + lines[line_idx + 1 :]
-            return "\n".join(result_lines)
+            return content[: nl[line_idx] + 1] + new_line + content[nl[line_idx + 1] :]
 
         return None
 
@@ -284,29 +563,73 @@ class CodeWorker(BaseWorker):
 
         Returns (matched_text, similarity_ratio) or None.
         """
-        target_lines = target.strip().split("\n")
-        content_lines = content.split("\n")
+        target_stripped = target.strip()
+        target_lines = target_stripped.split("\n")
+        nl = _newline_index(content)
+        line_count = len(nl) - 1
         target_len = len(target_lines)
 
-        best_match = None
-        best_ratio = 0.0
+        # A single short line is left to the whitespace/case strategies -
+        # fuzzy-matching it against every line mostly finds false positives
+        if target_len < 2 and len(target_stripped) < 40:
+            return None
+
+        last_start = line_count - target_len
+        if last_start < 0:
+            return None
 
-        # Slide a window over content lines
-        for i in range(len(content_lines) - target_len + 1):
-            candidate_lines = content_lines[i : i + target_len]
-            candidate = "\n".join(candidate_lines)
+        # Without rapidfuzz, one difflib matcher serves the whole scan. It
+        # indexes its second sequence, so the target goes there and is
+        # indexed only once. Keep autojunk on: treating indentation spaces
+        # as ordinary characters makes ratio() ~10x slower on long targets.
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(target_stripped)
 
-            # Use SequenceMatcher for fuzzy comparison
-            ratio = difflib.SequenceMatcher(
-                None, target.strip(), candidate.strip()
-            ).ratio()
+        best_idx = None
+        best_ratio = 0.0
+
+        def scan(starts, floor_min: float):
+            nonlocal best_idx, best_ratio
+            for i in starts:
+                candidate = content[nl[i] + 1 : nl[i + target_len]].strip()
+                floor = max(best_ratio, floor_min)
 
-            if ratio > best_ratio:
-                best_ratio = ratio
-                best_match = candidate
+                if rapidfuzz_fuzz is not None:
+                    # Indel similarity in C; returns 0 below the cutoff
+                    ratio = rapidfuzz_fuzz.ratio(candidate, target_stripped, score_cutoff=floor * 100) / 100
+                else:
+                    matcher.set_seq1(candidate)
+
+                    # Cheap upper bounds first - skip windows that can't beat
+                    # the best so far
+                    if matcher.real_quick_ratio() < floor or matcher.quick_ratio() < floor:
+                        continue
+
+                    ratio = matcher.ratio()
+
+                if ratio > best_ratio:
+                    best_ratio = ratio
+                    best_idx = i
+
+        # Coarse pass: windows overlapping by ~3/4, so a near-match still
+        # scores close to the true one. Sub-threshold windows are kept as
+        # candidates here since the fine pass may improve on them.
+        stride = max(1, target_len // 4)
+        coarse = list(range(0, last_start + 1, stride))
+        if coarse[-1] != last_start:
+            coarse.append(last_start)
+        scan(coarse, 0.0)
+
+        # Fine pass: every start position around the coarse maximum
+        if stride > 1 and best_idx is not None:
+            center = best_idx
+            scan(
+                range(max(0, center - stride + 1), min(last_start, center + stride - 1) + 1),
+                threshold,
+            )
 
-        if best_ratio >= threshold:
-            return (best_match, best_ratio)
+        if best_idx is not None and best_ratio >= threshold:
+            return (content[nl[best_idx] + 1 : nl[best_idx + target_len]], best_ratio)
         return None
 
     def _find_by_anchor_lines(
@@ -358,10 +681,8 @@ class CodeWorker(BaseWorker):
         )
 
         # Build the new content by replacing the identified range
-        new_lines = new_code.strip().split("\n")
-        result_lines = content_lines[:start_idx] + new_lines + content_lines[end_idx:]
-
-        return "\n".join(result_lines)
+        nl = _newline_index(content)
+        return content[: nl[start_idx] + 1] + new_code.strip() + content[nl[end_idx] :]
 
     async def add_test(self, file: str, code: str) -> bool:
         """
@@ -381,19 +702,33 @@ class CodeWorker(BaseWorker):
         """
         Use Claude to generate a fix for a file.
 
+        Results are cached on (model, file, issue, context, file content),
+        so retries against an unchanged file don't hit the API again.
+
         Returns dict with old_code, new_code, and description.
         """
         content = await self.read_file(file)
         if content is None:
             return None
 
-        prompt = """Analyze this code and generate a fix for the issue.
+        snippet = self._prompt_snippet(file, content, f"{issue_description}\n{context}")
+        key = hashlib.blake2b(
+            f"{self.model}|{file}|{issue_description}|{context}|{snippet}".encode("utf-8"),
+            digest_size=16,
+        ).hexdigest()
+
+        cached = await asyncio.to_thread(self.fix_cache.get, key)
+        if cached is not None:
+            self.log(f"Using cached fix for {file}")
+            return cached
+
+        prompt = f"""Analyze this code and generate a fix for the issue.
 
 **File:** {file}
 
 **Code:**
 ```python
-{content[:10000]}
+{snippet}
 ```
 
 **Issue:** {issue_description}
@@ -419,39 +754,123 @@ Rules:
   - Keep lines under 120 characters when possible"""
 
         try:
-            # Use await for async Claude client
-            response = await self.claude.messages.create(
-                model=self.model,
-                max_tokens=2000,
-                messages=[{"role": "user", "content": prompt}],
-            )
+            response = await self._create_message(prompt, max_tokens=2000)
+            if response is None:
+                return None
 
             text = response.content[0].text
 
-            # Extract JSON
-            import json
-
-            if "```json" in text:
-                text = text.split("```json")[1].split("```")[0]
-            elif "```" in text:
-                text = text.split("```")[1].split("```")[0]
-
-            return json.loads(text.strip())
+            # Extract JSON from a fenced block if there is one
+            match = _JSON_BLOCK_RE.search(text)
+            fix = json.loads(match.group(1) if match else text.strip())
+            await asyncio.to_thread(self.fix_cache.set, key, fix)
+            return fix
 
         except Exception as e:
             self.log(f"Error generating fix: {e}", "error")
             return None
 
+    async def _create_message(self, prompt: str, max_tokens: int):
+        """
+        Call Claude with bounded concurrency and retries.
+
+        Retries rate-limit, server and connection errors with exponential
+        backoff and jitter. Returns None once retries are exhausted.
+        """
+        if CodeWorker._claude_semaphore is None:
+            CodeWorker._claude_semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_CLAUDE_CALLS)
+
+        for attempt in range(self.CLAUDE_RETRIES):
+            try:
+                async with CodeWorker._claude_semaphore:
+                    # Use await for async Claude client
+                    return await self.claude.messages.create(
+                        model=self.model,
+                        max_tokens=max_tokens,
+                        messages=[{"role": "user", "content": prompt}],
+                    )
+            except (
+                anthropic.RateLimitError,
+                anthropic.InternalServerError,
+                anthropic.APIConnectionError,
+            ) as e:
+                if attempt + 1 == self.CLAUDE_RETRIES:
+                    self.log(f"Claude unavailable after {self.CLAUDE_RETRIES} attempts: {e}", "error")
+                    return None
+                delay = random.uniform(0, 2 ** (attempt + 1))
+                self.log(f"Claude call failed ({e}), retrying in {delay:.1f}s", "warning")
+                await asyncio.sleep(delay)
+
+        return None
+
+    def _prompt_snippet(self, file: str, content: str, issue_text: str) -> str:
+        """
+        Pick the part of a file to show Claude for a fix.
+
+        Small files are sent whole. For larger Python files, sends the first
+        lines (imports) plus the functions/classes whose names appear in the
+        issue text, instead of blindly cutting at PROMPT_CODE_CHARS - the
+        code at fault is often past that point. Every section is verbatim
+        source so old_code can still match exactly.
+        """
+        budget = self.PROMPT_CODE_CHARS
+        if len(content) <= budget:
+            return content
+
+        tree = _parse_python(content) if file.endswith(".py") else None
+        names = set(_IDENTIFIER_RE.findall(issue_text))
+        if tree is None or not names:
+            return content[:budget]
+
+        ranges = []
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) and node.name in names:
+                first = min([node.lineno] + [d.lineno for d in node.decorator_list])
+                ranges.append((first - 1, node.end_lineno))
+        if not ranges:
+            return content[:budget]
+
+        # Merge overlapping ranges (e.g. a method inside a matched class),
+        # keeping the header lines first
+        merged = [(0, self.PROMPT_HEADER_LINES)]
+        for start, end in sorted(ranges):
+            if start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+
+        nl = _newline_index(content)
+        last_line = len(nl) - 1
+        sections = []
+        used = 0
+        for start, end in merged:
+            section = content[nl[start] + 1 : nl[min(end, last_line)]]
+            if used + len(section) > budget:
+                # Too big to include whole (e.g. a large matched class)
+                continue
+            sections.append(section)
+            used += len(section)
+
+        if len(sections) < 2:
+            # Nothing beyond the header fitted
+            return content[:budget]
+        return "\n\n# ...\n\n".join(sections)
+
     async def find_function(self, file: str, function_name: str) -> Optional[str]:
         """Find a function definition in a file."""
         content = await self.read_file(file)
         if content is None:
             return None
 
-        # Pattern for Python function/method definition
-        pattern = rf"((?:async\s+)?def\s+{re.escape(function_name)}\s*\([^)]*\)[^:]*:.*?)(?=\n(?:async\s+)?def\s|\nclass\s|\Z)"
+        # Cheap literal check before parsing or running the regex
+        if function_name not in content:
+            return None
+
+        tree = _parse_python(content) if file.endswith(".py") else None
+        if tree is not None:
+            return _find_ast_definition(content, tree, (ast.FunctionDef, ast.AsyncFunctionDef), function_name)
 
-        match = re.search(pattern, content, re.DOTALL)
+        match = _function_pattern(function_name).search(content)
         if match:
             return match.group(1)
 
@@ -463,44 +882,111 @@ Rules:
         if content is None:
             return None
 
-        pattern = (
-            rf"(class\s+{re.escape(class_name)}\s*(?:\([^)]*\))?:.*?)(?=\nclass\s|\Z)"
-        )
+        # Cheap literal check before parsing or running the regex
+        if class_name not in content:
+            return None
+
+        tree = _parse_python(content) if file.endswith(".py") else None
+        if tree is not None:
+            return _find_ast_definition(content, tree, (ast.ClassDef,), class_name)
 
-        match = re.search(pattern, content, re.DOTALL)
+        match = _class_pattern(class_name).search(content)
         if match:
             return match.group(1)
 
         return None
 
     async def search_codebase(
-        self, pattern: str, file_types: List[str] = None
+        self, pattern: str, file_types: List[str] = None, max_matches: Optional[int] = None
     ) -> List[dict]:
         """
         Search the codebase for a pattern.
 
+        The pattern is matched as a literal string. Uses ripgrep when it is
+        installed (JSON output, parallel walk, skips .gitignore'd paths such
+        as venv/) and falls back to grep; both get the same fixed-string
+        search. Matches are parsed as they stream in; once max_matches is
+        reached the search is stopped. Matched lines longer than
+        SEARCH_MAX_COLUMNS come back as a preview of that many characters.
+        If the search tool fails, the error is logged and the matches found
+        so far are returned.
+
         Returns list of {file, line, content} matches.
         """
         file_types = file_types or ["*.py", "*.html", "*.js"]
         matches = []
 
-        for file_type in file_types:
-            result = await self.run_command(
-                f'grep -rn "{pattern}" --include="{file_type}" .',
-                cwd=self.codebase_path,
-            )
-
-            if result.success and result.message:
-                for line in result.message.split("\n"):
-                    if ":" in line:
-                        parts = line.split(":", 2)
-                        if len(parts) >= 3:
-                            matches.append(
-                                {
-                                    "file": parts[0].lstrip("./"),
-                                    "line": int(parts[1]),
-                                    "content": parts[2].strip(),
-                                }
-                            )
+        # One recursive walk for all file types. The pattern is passed as an
+        # argv entry (no shell), so it is never interpolated.
+        rg = shutil.which("rg")
+        if rg:
+            command = [rg, "--json", "--fixed-strings"]
+            command += [f"--max-columns={self.SEARCH_MAX_COLUMNS}", "--max-columns-preview"]
+            for file_type in file_types:
+                command += ["--glob", file_type]
+            command += ["-e", pattern, "."]
+            parse = self._parse_rg_line
+        else:
+            # -Z puts a NUL after the filename so paths and content
+            # containing ":" parse correctly
+            command = ["grep", "-rnZF", "-e", pattern]
+            command += [f"--include={file_type}" for file_type in file_types]
+            command.append(".")
+            parse = self._parse_grep_line
+
+        status = WorkerResult(success=True)
+        lines = self.stream_command(command, cwd=self.codebase_path, status=status)
+        try:
+            async for line in lines:
+                match = parse(line)
+                if match is None:
+                    continue
+                matches.append(match)
+                if max_matches is not None and len(matches) >= max_matches:
+                    break
+        finally:
+            await lines.aclose()
+
+        # Both tools exit 1 for "no matches" and 2 for an actual error
+        if not status.success and (status.data or {}).get("returncode") != 1:
+            self.log(f"Search for {pattern!r} failed: {status.error}", "error")
 
         return matches
+
+    def _parse_rg_line(self, line: str) -> Optional[dict]:
+        """Parse one line of `rg --json` output into a match dict."""
+        try:
+            event = json.loads(line)
+        except json.JSONDecodeError:
+            return None
+        if event.get("type") != "match":
+            return None
+
+        data = event["data"]
+        # Non-UTF-8 paths/lines come back base64-encoded under "bytes"; skip them
+        path = data.get("path", {}).get("text")
+        text = data.get("lines", {}).get("text")
+        if path is None or text is None:
+            return None
+
+        return {
+            "file": path.removeprefix("./"),
+            "line": data["line_number"],
+            "content": text.strip()[: self.SEARCH_MAX_COLUMNS],
+        }
+
+    def _parse_grep_line(self, line: str) -> Optional[dict]:
+        """Parse one line of `grep -rnZ` output into a match dict."""
+        if "\0" not in line:
+            return None
+        file_name, rest = line.split("\0", 1)
+        line_no, _, text = rest.partition(":")
+        if not line_no.isdigit():
+            return None
+
+        return {
+            "file": file_name.removeprefix("./"),
+            "line": int(line_no),
+            # grep has no column cap - trim here like rg's preview
+            "content": text.strip()[: self.SEARCH_MAX_COLUMNS],
+        }
@@ -3,6 +3,9 @@ Docker Worker - Handles Docker operations for deployment
 """
 
 import asyncio
+import functools
+import random
+import sys
 from pathlib import Path
 from typing import Optional
 from dataclasses import dataclass
@@ -11,6 +14,28 @@ import aiohttp
 
 from .base_worker import BaseWorker, WorkerResult
 
+# discord_utils.send_discord, imported on the first deployment notification
+_send_discord = None
+
+
+def _get_send_discord():
+    """Return discord_utils.send_discord, importing it on first use; None if it isn't importable."""
+    global _send_discord
+    if _send_discord is None:
+        try:
+            from discord_utils import send_discord
+        except ImportError:
+            # Not run from the repo root - discord_utils lives there
+            repo_root = str(Path(__file__).parent.parent)
+            if repo_root not in sys.path:
+                sys.path.insert(0, repo_root)
+            try:
+                from discord_utils import send_discord
+            except ImportError:
+                return None
+        _send_discord = send_discord
+    return _send_discord
+
 
 @dataclass
 class DeployResult:
@@ -42,6 +67,10 @@ class DockerWorker(BaseWorker):
         self.app_port = app_port
         self.app_url = f"http://{docker_host}:{app_port}"
         self.compose_dir = Path("/home/dev/docker")  # On container 104
+        # HTTP session for health checks, opened on first use and kept until close()
+        self._http_session: Optional[aiohttp.ClientSession] = None
+        # Strong refs to fire-and-forget notification tasks until they finish
+        self._background_tasks: set = set()
 
     async def rebuild_and_deploy(self) -> DeployResult:
         """
@@ -72,8 +101,8 @@ class DockerWorker(BaseWorker):
         if not healthy:
             return DeployResult(success=False, error="Container failed health check")
 
-        # Send deployment notification
-        await self._notify_deployment("success")
+        # Send deployment notification without holding up the result
+        self._notify_in_background("success")
 
         return DeployResult(success=True, message="Deployment successful")
 
@@ -104,7 +133,7 @@ class DockerWorker(BaseWorker):
         healthy = await self.wait_for_healthy(timeout=90)
 
         # Notify
-        await self._notify_deployment("rollback")
+        self._notify_in_background("rollback")
 
         return DeployResult(success=healthy, message="Rollback complete" if healthy else "Rollback may have issues")
 
@@ -114,20 +143,43 @@ class DockerWorker(BaseWorker):
 
         Checks the /api/stats endpoint for a 200 response.
         """
-        start = asyncio.get_event_loop().time()
+        return await self._poll_health(self._get_http_session(), timeout)
+
+    def _get_http_session(self) -> aiohttp.ClientSession:
+        """Shared session, so every poll (and every wait) reuses the keep-alive connection."""
+        if self._http_session is None or self._http_session.closed:
+            connector = aiohttp.TCPConnector(limit=4, keepalive_timeout=60)
+            self._http_session = aiohttp.ClientSession(connector=connector)
+        return self._http_session
+
+    async def close(self):
+        """Close the HTTP session and the persistent shell."""
+        http_session, self._http_session = self._http_session, None
+        if http_session is not None:
+            await http_session.close()
+        await super().close()
+
+    async def _poll_health(self, session: aiohttp.ClientSession, timeout: int) -> bool:
+        """Poll the health endpoint with session until it returns 200 or timeout."""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
         health_url = f"{self.app_url}/api/stats"
+        request_timeout = aiohttp.ClientTimeout(total=5)
 
-        while asyncio.get_event_loop().time() - start < timeout:
+        # Capped exponential backoff: fast-starting containers are seen
+        # quickly without hammering slow ones
+        delay = 0.25
+        while loop.time() - start < timeout:
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(health_url, timeout=5) as resp:
-                        if resp.status == 200:
-                            self.log("Container is healthy")
-                            return True
+                async with session.get(health_url, timeout=request_timeout) as resp:
+                    if resp.status == 200:
+                        self.log("Container is healthy")
+                        return True
             except Exception:
                 pass
 
-            await asyncio.sleep(2)
+            await asyncio.sleep(delay + random.uniform(0, delay * 0.1))
+            delay = min(delay * 2, 5.0)
 
         self.log("Health check timed out", "warning")
         return False
@@ -161,14 +213,18 @@ class DockerWorker(BaseWorker):
 
         return await self.run_command(full_command, timeout=600)
 
+    def _notify_in_background(self, status: str):
+        """Schedule _notify_deployment as a task the caller doesn't wait on."""
+        task = asyncio.create_task(self._notify_deployment(status))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
     async def _notify_deployment(self, status: str):
         """Send deployment notification to Discord."""
         try:
-            # Import here to avoid circular imports
-            import sys
-
-            sys.path.insert(0, str(Path(__file__).parent.parent))
-            from discord_utils import send_discord
+            send_discord = _get_send_discord()
+            if send_discord is None:
+                raise RuntimeError("discord_utils is not importable")
 
             issue = self.session.issue
             color = 0x4ECDC4 if status == "success" else 0xFF6B6B
@@ -181,13 +237,18 @@ class DockerWorker(BaseWorker):
             if self.session.pr_url:
                 fields.append({"name": "Pull Request", "value": self.session.pr_url, "inline": False})
 
-            send_discord(
-                channel="deployments",
-                message="",
-                title=f"Deployment: {status.title()}",
-                color=color,
-                fields=fields,
-                username="Mastermind Deploy",
+            # send_discord posts with blocking requests - keep it off the event loop
+            await asyncio.get_running_loop().run_in_executor(
+                None,
+                functools.partial(
+                    send_discord,
+                    channel="deployments",
+                    message="",
+                    title=f"Deployment: {status.title()}",
+                    color=color,
+                    fields=fields,
+                    username="Mastermind Deploy",
+                ),
             )
 
         except Exception as e:
@@ -2,12 +2,98 @@
 Git Worker - Handles git operations
 """
 
+import asyncio
+import json
+import random
 import re
+import shlex
 from pathlib import Path
-from typing import Optional, List
+from typing import Dict, Optional, List, Tuple
+
+try:
+    # Optional: in-process libgit2 bindings for read-only queries
+    import pygit2
+except ImportError:
+    pygit2 = None
 
 from .base_worker import BaseWorker, WorkerResult
 
+_SLUG_RE = re.compile(r"[^a-z0-9]+")
+_URL_RE = re.compile(r"https://github\.com/[^\s]+")
+
+
+def _status_bucket(code: str) -> Optional[str]:
+    """Classify a porcelain XY code: any A is added (even if since modified), then M, D, ?."""
+    for char, bucket in (("A", "added"), ("M", "modified"), ("D", "deleted"), ("?", "untracked")):
+        if char in code:
+            return bucket
+    return None
+
+
+# Every porcelain XY code -> get_status bucket, so parsing is one lookup per line
+_STATUS_CHARS = " MTADRCU?!"
+_STATUS_BUCKETS = {x + y: bucket for x in _STATUS_CHARS for y in _STATUS_CHARS if (bucket := _status_bucket(x + y))}
+
+
+def _porcelain_codes(flags: int) -> List[str]:
+    """Convert pygit2 status flags to the XY code(s) `git status --porcelain` prints."""
+    if flags & pygit2.GIT_STATUS_CONFLICTED:
+        return ["UU"]
+    x = y = " "
+    for flag, char in (
+        (pygit2.GIT_STATUS_INDEX_NEW, "A"),
+        (pygit2.GIT_STATUS_INDEX_MODIFIED, "M"),
+        (pygit2.GIT_STATUS_INDEX_DELETED, "D"),
+        (pygit2.GIT_STATUS_INDEX_RENAMED, "R"),
+        (pygit2.GIT_STATUS_INDEX_TYPECHANGE, "T"),
+    ):
+        if flags & flag:
+            x = char
+            break
+    if flags & pygit2.GIT_STATUS_WT_NEW:
+        # A path deleted from the index but still on disk gets two lines
+        return ["??"] if x == " " else [x + " ", "??"]
+    for flag, char in (
+        (pygit2.GIT_STATUS_WT_MODIFIED, "M"),
+        (pygit2.GIT_STATUS_WT_DELETED, "D"),
+        (pygit2.GIT_STATUS_WT_RENAMED, "R"),
+        (pygit2.GIT_STATUS_WT_TYPECHANGE, "T"),
+    ):
+        if flags & flag:
+            y = char
+            break
+    return [x + y]
+
+
+# Runs Black --check and Flake8 in one interpreter: argv is
+# <black files> -- <flake8 files>. Flake8 reports go to stdout as usual and
+# the exit code reflects them; the last stdout line is a JSON summary
+# holding Black's exit code and captured output.
+_CI_CHECK_SCRIPT = """
+import contextlib, io, json, sys
+import black
+from flake8.api import legacy
+
+split = sys.argv.index("--")
+black_files, flake8_files = sys.argv[1:split], sys.argv[split + 1 :]
+
+black_code, buf = 0, io.StringIO()
+if black_files:
+    with contextlib.redirect_stdout(buf), contextlib.redirect_stderr(buf):
+        try:
+            black_code = black.main(["--check", *black_files], standalone_mode=False)
+        except SystemExit as e:
+            black_code = e.code
+
+flake8_errors = 0
+if flake8_files:
+    flake8_errors = legacy.get_style_guide(max_line_length=120).check_files(flake8_files).total_errors
+
+sys.stdout.flush()
+print(json.dumps({"black": [black_code or 0, buf.getvalue()]}))
+sys.exit(1 if flake8_errors else 0)
+"""
+
 
 class GitWorker(BaseWorker):
     """
@@ -18,6 +104,31 @@ class GitWorker(BaseWorker):
 
     def __init__(self, session, codebase_path: Optional[Path] = None):
         super().__init__(session, codebase_path)
+        self._repo = None
+        self._repo_opened = False
+        # Strong refs to fire-and-forget tasks until they finish
+        self._background_tasks: set = set()
+
+    def _open_repo(self):
+        """Return a shared pygit2 Repository, or None to use the git CLI."""
+        if not self._repo_opened:
+            self._repo_opened = True
+            if pygit2 is not None:
+                try:
+                    self._repo = pygit2.Repository(str(self.codebase_path))
+                except (pygit2.GitError, KeyError, OSError) as e:
+                    self.log(f"pygit2 unavailable for {self.codebase_path} ({e}), using git CLI", "warning")
+        return self._repo
+
+    def _head_hash(self) -> Optional[str]:
+        """Full HEAD commit hash via pygit2, or None if unavailable."""
+        repo = self._open_repo()
+        if repo is None:
+            return None
+        try:
+            return str(repo.head.target)
+        except pygit2.GitError:
+            return None
 
     async def create_branch(self, issue) -> str:
         """
@@ -39,20 +150,25 @@ class GitWorker(BaseWorker):
         await self.run_command("git pull origin main")
 
         # Create and checkout new branch
-        result = await self.run_command(f"git checkout -b {branch_name}")
+        result = await self.run_command(["git", "checkout", "-b", branch_name])
 
         if not result.success:
             # Branch might already exist
-            await self.run_command(f"git checkout {branch_name}")
+            await self.run_command(["git", "checkout", branch_name])
 
         return branch_name
 
-    async def verify_ci_locally(self, files: List[str]) -> WorkerResult:
+    async def verify_ci_locally(self, files: List[str], skip_black_check: bool = False) -> WorkerResult:
         """
         Run CI checks locally before committing.
 
         Runs Black formatting check and Flake8 linting on modified Python files.
         Returns failure if any check fails, allowing developers to fix issues.
+
+        Args:
+            files: Files to check (non-Python files are ignored)
+            skip_black_check: Skip Black --check, e.g. because the files were
+                just formatted successfully (missing files are still reported)
         """
         python_files = [f for f in files if f.endswith(".py")]
         if not python_files:
@@ -61,22 +177,17 @@ class GitWorker(BaseWorker):
         self.log(f"Running CI checks on {len(python_files)} Python files")
         errors = []
 
+        black_failures, flake8_failures = await self._run_checks(python_files, skip_black_check)
+
         # Check Black formatting
         for file in python_files:
-            result = await self.run_command(
-                f'python3 -m black --check "{file}" 2>&1 || python -m black --check "{file}" 2>&1'
-            )
-            if not result.success:
+            if file in black_failures:
                 errors.append(f"Black formatting failed for {file}")
 
         # Check Flake8 linting
         for file in python_files:
-            result = await self.run_command(
-                f'python3 -m flake8 "{file}" --max-line-length=120 2>&1 || '
-                f'python -m flake8 "{file}" --max-line-length=120 2>&1'
-            )
-            if not result.success and result.message.strip():
-                errors.append(f"Flake8 errors in {file}: {result.message[:200]}")
+            if file in flake8_failures:
+                errors.append(f"Flake8 errors in {file}: {flake8_failures[file][:200]}")
 
         if errors:
             return WorkerResult(
@@ -88,6 +199,123 @@ class GitWorker(BaseWorker):
         self.log("All CI checks passed")
         return WorkerResult(success=True, message="All CI checks passed")
 
+    async def _run_checks(
+        self, python_files: List[str], skip_black_check: bool = False
+    ) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """Run Black and Flake8 over python_files; returns their {file: reason} failures."""
+        black_failures, existing = self._split_missing(python_files)
+        if skip_black_check:
+            existing = []
+
+        fused = await self._run_fused_checks(existing, python_files)
+        if fused is None:
+            if skip_black_check:
+                return black_failures, await self._check_flake8(python_files)
+            # Tools can't be imported together - one CLI run of each, concurrently
+            return await asyncio.gather(self._check_black(python_files), self._check_flake8(python_files))
+
+        (black_ok, black_output), (flake8_ok, flake8_output) = fused
+        if existing:
+            black_failures.update(self._parse_black_output(existing, black_ok, black_output))
+        return black_failures, self._parse_flake8_output(python_files, flake8_ok, flake8_output)
+
+    async def _run_fused_checks(
+        self, black_files: List[str], flake8_files: List[str]
+    ) -> Optional[Tuple[Tuple[bool, str], Tuple[bool, str]]]:
+        """
+        Run Black --check and Flake8 inside one Python process.
+
+        Saves an interpreter start-up and import per tool. Returns
+        ((black_ok, black_output), (flake8_ok, flake8_output)), or None if
+        black or flake8 isn't importable by the codebase's Python.
+        """
+        args = ["-c", _CI_CHECK_SCRIPT, *black_files, "--", *flake8_files]
+        for python in ("python3", "python"):
+            result = await self.run_command([python, *args])
+            output, _, summary = result.message.rpartition("\n")
+            if not summary.startswith("{"):
+                continue
+            try:
+                black_code, black_output = json.loads(summary)["black"]
+            except (ValueError, KeyError):
+                continue
+            return (black_code == 0, black_output), (result.success, output)
+        return None
+
+    def _split_missing(self, python_files: List[str]) -> Tuple[Dict[str, str], List[str]]:
+        """Split files into ({missing file: reason}, existing files)."""
+        failures = {}
+        existing = []
+        for file in python_files:
+            if (self.codebase_path / file).exists():
+                existing.append(file)
+            else:
+                # Black aborts the whole run on a missing path, so report it here
+                failures[file] = "file not found"
+        return failures, existing
+
+    async def _check_black(self, python_files: List[str]) -> Dict[str, str]:
+        """Run Black --check once over all files; returns {file: reason} for failures."""
+        failures, existing = self._split_missing(python_files)
+        if not existing:
+            return failures
+
+        files_arg = " ".join(shlex.quote(f) for f in existing)
+        result = await self.run_command(
+            f"python3 -m black --check {files_arg} 2>&1 || python -m black --check {files_arg} 2>&1"
+        )
+        failures.update(self._parse_black_output(existing, result.success, result.message or result.error or ""))
+        return failures
+
+    def _parse_black_output(self, files: List[str], success: bool, output: str) -> Dict[str, str]:
+        """Map Black --check output to {file: reason} for the files it rejected."""
+        if success:
+            return {}
+
+        failures = {}
+        for line in output.split("\n"):
+            for prefix in ("would reformat ", "error: cannot format ", "error: cannot parse: "):
+                if line.startswith(prefix):
+                    rest = line[len(prefix) :]
+                    for file in files:
+                        # "<file>", "<file>: reason" or "<file>:line:col"
+                        if rest.startswith(file) and rest[len(file) : len(file) + 1] in ("", ":", " "):
+                            failures.setdefault(file, line)
+
+        if not any(f in failures for f in files):
+            # Black itself failed (e.g. not installed) - every file fails
+            return {file: output or "Black failed" for file in files}
+
+        return failures
+
+    async def _check_flake8(self, python_files: List[str]) -> Dict[str, str]:
+        """Run Flake8 once over all files; returns {file: output} for files with errors."""
+        files_arg = " ".join(shlex.quote(f) for f in python_files)
+        result = await self.run_command(
+            f"python3 -m flake8 {files_arg} --max-line-length=120 2>&1 || "
+            f"python -m flake8 {files_arg} --max-line-length=120 2>&1"
+        )
+        return self._parse_flake8_output(python_files, result.success, result.message)
+
+    def _parse_flake8_output(self, files: List[str], success: bool, output: str) -> Dict[str, str]:
+        """Group Flake8 output into {file: output} for files with errors."""
+        if success or not output.strip():
+            return {}
+
+        # Group output lines by the file they start with (dropping the
+        # duplicates the fallback command can produce)
+        by_file: Dict[str, List[str]] = {}
+        for line in dict.fromkeys(output.split("\n")):
+            file = line.split(":", 1)[0]
+            if file in files:
+                by_file.setdefault(file, []).append(line)
+
+        if not by_file:
+            # Flake8 itself failed (e.g. not installed) - every file fails
+            return {file: output for file in files}
+
+        return {file: "\n".join(lines) for file, lines in by_file.items()}
+
     async def commit_changes(self, message: str, files: List[str]) -> WorkerResult:
         """
         Stage and commit changes.
@@ -103,52 +331,60 @@ class GitWorker(BaseWorker):
 
         # Run Black formatter on Python files before committing
         python_files = [f for f in files if f.endswith(".py")]
+        # Skip files that don't exist - Black aborts the whole run on a missing path
+        python_files = [f for f in python_files if (self.codebase_path / f).exists()]
+        formatted = False
         if python_files:
             self.log(f"Formatting {len(python_files)} Python files with Black")
-            for file in python_files:
-                # Run Black on each file, ignore errors (file might not exist)
-                await self.run_command(
-                    f'python3 -m black "{file}" 2>/dev/null || python -m black "{file}" 2>/dev/null || true'
-                )
+            files_arg = " ".join(shlex.quote(f) for f in python_files)
+            # Formatting is best effort - on failure verify_ci_locally reports problems
+            format_result = await self.run_command(
+                f"python3 -m black {files_arg} 2>/dev/null || python -m black {files_arg} 2>/dev/null"
+            )
+            formatted = format_result.success
 
-        # Verify CI checks pass before committing
-        ci_result = await self.verify_ci_locally(files)
+        # Verify CI checks pass before committing. Black just rewrote every
+        # file successfully, so its --check can only pass - skip it
+        ci_result = await self.verify_ci_locally(files, skip_black_check=formatted)
         if not ci_result.success:
             self.log(f"CI verification failed: {ci_result.error}", "error")
             return ci_result
 
-        # Stage files
-        for file in files:
-            await self.run_command(f'git add "{file}"')
+        # Stage files (one git process for all paths)
+        if files:
+            await self.run_command(["git", "add", "--", *files])
 
         # Format commit message
-        full_message = f"""{message}
-
-Automated fix by Mastermind Agent
-
-Co-Authored-By: Claude <noreply@anthropic.com>
-"""
-
-        # Commit
-        # Use a temp file for the message to handle special characters
-        msg_file = self.codebase_path / ".git" / "COMMIT_MSG"
-        msg_file.write_text(full_message, encoding="utf-8")
+        full_message = "\n".join(
+            [
+                message,
+                "",
+                "Automated fix by Mastermind Agent",
+                "",
+                "Co-Authored-By: Claude <noreply@anthropic.com>",
+                "",
+            ]
+        )
 
-        result = await self.run_command(f'git commit -F "{msg_file}"')
+        # Commit, passing the message on stdin to handle special characters
+        result = await self.run_command(["git", "commit", "-F", "-"], input=full_message.encode("utf-8"))
 
         if result.success:
             # Get commit hash
-            hash_result = await self.run_command("git rev-parse HEAD")
-            if hash_result.success:
-                result.data = {"commit_hash": hash_result.message[:8]}
-                self.session.commit_hash = hash_result.message[:8]
+            commit_hash = self._head_hash()
+            if commit_hash is None:
+                hash_result = await self.run_command(["git", "rev-parse", "HEAD"])
+                commit_hash = hash_result.message if hash_result.success else None
+            if commit_hash:
+                result.data = {"commit_hash": commit_hash[:8]}
+                self.session.commit_hash = commit_hash[:8]
 
         return result
 
     async def push_branch(self, branch_name: str) -> WorkerResult:
         """Push branch to origin."""
         self.log(f"Pushing branch: {branch_name}")
-        return await self.run_command(f"git push -u origin {branch_name}")
+        return await self.run_command(["git", "push", "-u", "origin", branch_name])
 
     async def create_pr(self, branch_name: str, strategy) -> Optional[str]:
         """
@@ -194,13 +430,10 @@ Automated fix for issue reported by test agent.
 Automated by Mastermind Agent
 """
 
-        # Write body to temp file to handle special characters
-        body_file = self.codebase_path / ".git" / "PR_BODY"
-        body_file.write_text(body, encoding="utf-8")
-
+        # Pass the body on stdin to handle special characters
         result = await self.run_command(
-            f'gh pr create --title "{title}" --body-file "{body_file}" '
-            f"--base main --head {branch_name}"
+            ["gh", "pr", "create", "--title", title, "--body-file", "-"] + ["--base", "main", "--head", branch_name],
+            input=body.encode("utf-8"),
         )
 
         if result.success:
@@ -222,18 +455,21 @@ Automated by Mastermind Agent
         Args:
             pr_number: PR number to check
             timeout_minutes: Max time to wait for CI
-            poll_interval: Seconds between checks
+            poll_interval: Maximum seconds between checks (polling starts
+                at 5s and backs off exponentially up to this)
 
         Returns:
             WorkerResult with CI status (success if all checks pass)
         """
-        import asyncio
-
         self.log(f"Waiting for CI checks on PR #{pr_number}")
 
-        max_attempts = (timeout_minutes * 60) // poll_interval
-        for attempt in range(max_attempts):
-            result = await self.run_command(f"gh pr checks {pr_number}")
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout_minutes * 60
+        delay = min(5.0, poll_interval)
+        attempt = 0
+        while loop.time() < deadline:
+            attempt += 1
+            result = await self.run_command(["gh", "pr", "checks", str(pr_number)])
 
             if result.success:
                 # All checks passed
@@ -260,10 +496,9 @@ Automated by Mastermind Agent
                 )
 
             # Still pending, wait and retry
-            self.log(
-                f"CI checks pending, waiting {poll_interval}s (attempt {attempt + 1}/{max_attempts})"
-            )
-            await asyncio.sleep(poll_interval)
+            self.log(f"CI checks pending, waiting {delay:.0f}s (attempt {attempt})")
+            await asyncio.sleep(delay + random.uniform(0, delay * 0.1))
+            delay = min(delay * 2, poll_interval)
 
         return WorkerResult(
             success=False,
@@ -280,38 +515,55 @@ Automated by Mastermind Agent
         """
         self.log("Rolling back changes")
 
-        # First discard any uncommitted changes to ensure clean state
-        await self.run_command("git checkout -- .")
-
-        # Then checkout main
-        await self.run_command("git checkout main")
-
-        # Discard any changes again (in case main had uncommitted changes)
-        await self.run_command("git checkout -- .")
-
-        # Delete local branch if provided
+        # One shell run; steps are joined with ';' so each runs even if an
+        # earlier one fails, as when they were separate commands:
+        # discard uncommitted changes, checkout main, discard again (in case
+        # main had uncommitted changes), then delete the local branch
+        steps = ["git checkout -- .", "git checkout main", "git checkout -- ."]
         if branch_name:
-            await self.run_command(f"git branch -D {branch_name}")
+            steps.append(f"git branch -D {shlex.quote(branch_name)}")
+        await self.run_command("; ".join(steps))
 
-            # Delete remote branch (ignore errors)
-            await self.run_command(f"git push origin --delete {branch_name}")
+        if branch_name:
+            # Delete remote branch (ignore errors) - network-bound, so don't wait on it
+            task = asyncio.create_task(self.run_command(["git", "push", "origin", "--delete", branch_name]))
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
 
         return WorkerResult(success=True, message="Rollback complete")
 
-    async def get_diff(self, files: Optional[List[str]] = None) -> str:
-        """Get the diff of current changes."""
+    async def get_diff(self, files: Optional[List[str]] = None, stat_only: bool = False, context_lines: int = 3) -> str:
+        """
+        Get the diff of current changes.
+
+        Args:
+            files: Limit the diff to these paths
+            stat_only: Return `git diff --stat` output instead of a patch
+            context_lines: Unchanged lines around each hunk; 1 roughly halves
+                the size of a diff of many small edits (e.g. for a prompt)
+        """
+        repo = self._open_repo() if not stat_only else None
+        if repo is not None:
+            try:
+                # Working tree vs index, like plain `git diff`
+                diff = repo.diff(context_lines=context_lines)
+                if not files:
+                    return (diff.patch or "").strip()
+                wanted = set(files)
+                return "".join(patch.text for patch in diff if patch.delta.new_file.path in wanted).strip()
+            except pygit2.GitError as e:
+                self.log(f"pygit2 diff failed ({e}), using git CLI", "warning")
+
+        command = ["git", "diff", "--no-color"]
+        command.append("--stat" if stat_only else f"-U{context_lines}")
         if files:
-            files_arg = " ".join(f'"{f}"' for f in files)
-            result = await self.run_command(f"git diff {files_arg}")
-        else:
-            result = await self.run_command("git diff")
+            command += ["--", *files]
+        result = await self.run_command(command)
 
         return result.message if result.success else ""
 
     async def get_status(self) -> dict:
         """Get git status information."""
-        result = await self.run_command("git status --porcelain")
-
         status = {
             "modified": [],
             "added": [],
@@ -319,28 +571,60 @@ Automated by Mastermind Agent
             "untracked": [],
         }
 
+        repo = self._open_repo()
+        if repo is not None:
+            try:
+                entries = repo.status(untracked_files="normal")
+            except pygit2.GitError as e:
+                self.log(f"pygit2 status failed ({e}), using git CLI", "warning")
+            else:
+                for file, flags in sorted(entries.items()):
+                    for code in _porcelain_codes(flags):
+                        bucket = _STATUS_BUCKETS.get(code)
+                        if bucket:
+                            status[bucket].append(file)
+                return status
+
+        # Porcelain v2 with NUL separators: paths arrive unquoted, and no
+        # record starts with a space that output stripping could eat
+        result = await self.run_command(["git", "status", "--porcelain=v2", "-z"])
+
         if result.success and result.message:
-            for line in result.message.split("\n"):
-                if not line.strip():
+            fields = iter(result.message.split("\0"))
+            for record in fields:
+                kind = record[:1]
+                if kind == "?":
+                    status["untracked"].append(record[2:])
                     continue
-
-                code = line[:2]
-                file = line[3:]
-
-                if "M" in code:
-                    status["modified"].append(file)
-                elif "A" in code:
-                    status["added"].append(file)
-                elif "D" in code:
-                    status["deleted"].append(file)
-                elif "?" in code:
-                    status["untracked"].append(file)
+                if kind not in ("1", "2", "u"):
+                    continue
+                # "1 XY sub mH mI mW hH hI path"; "2" adds a score field and is
+                # followed by the original path; "u" has three modes and hashes
+                parts = record.split(" ", {"1": 8, "2": 9, "u": 10}[kind])
+                code = parts[1].replace(".", " ")
+                if kind == "2":
+                    # pygit2 doesn't detect renames or copies: it reports the
+                    # new path as added and a renamed-away path as deleted
+                    orig_path = next(fields, "")
+                    if "R" in code:
+                        status["deleted"].append(orig_path)
+                    code = code.replace("R", "A").replace("C", "A")
+                bucket = _STATUS_BUCKETS.get(code)
+                if bucket:
+                    status[bucket].append(parts[-1])
 
         return status
 
     async def get_current_branch(self) -> str:
         """Get the current branch name."""
-        result = await self.run_command("git branch --show-current")
+        repo = self._open_repo()
+        if repo is not None:
+            try:
+                return "" if repo.head_is_detached else repo.head.shorthand
+            except pygit2.GitError:
+                pass  # Unborn branch - the CLI still reports its name
+
+        result = await self.run_command(["git", "branch", "--show-current"])
         return result.message if result.success else "unknown"
 
     def _slugify(self, text: str) -> str:
@@ -348,12 +632,12 @@ Automated by Mastermind Agent
         # Convert to lowercase
         slug = text.lower()
         # Replace non-alphanumeric with hyphens
-        slug = re.sub(r"[^a-z0-9]+", "-", slug)
+        slug = _SLUG_RE.sub("-", slug)
         # Remove leading/trailing hyphens
         slug = slug.strip("-")
         return slug
 
     def _extract_url(self, text: str) -> Optional[str]:
         """Extract a URL from text."""
-        match = re.search(r"https://github\.com/[^\s]+", text)
+        match = _URL_RE.search(text)
         return match.group(0) if match else None
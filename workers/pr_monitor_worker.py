@@ -3,19 +3,62 @@ PR Monitor Worker - Monitors GitHub PRs for CI status and handles failures
 """
 
 import asyncio
+import dataclasses
 import json
 import logging
+import random
 import re
+import time
+from collections import deque
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
 from pathlib import Path
-from typing import Optional, List
+from typing import Deque, Dict, Optional, List, Sequence, Tuple
 
 from .base_worker import BaseWorker, WorkerResult
 
 logger = logging.getLogger(__name__)
 
+# "Retry-After: 120" as printed by gh for throttled requests
+_RETRY_AFTER_RE = re.compile(r"retry-after:\s*(\d+)", re.IGNORECASE)
+# Rate-limit response headers from `gh api -i`
+_RATELIMIT_REMAINING_RE = re.compile(r"^x-ratelimit-remaining:\s*(\d+)", re.IGNORECASE | re.MULTILINE)
+_RATELIMIT_RESET_RE = re.compile(r"^x-ratelimit-reset:\s*(\d+)", re.IGNORECASE | re.MULTILINE)
+
+# Lines of a CI log that failure parsing can use: error/failure lines, lint
+# and test output, and the tool names used to detect the failure type
+_LOG_FILTER_RE = re.compile(r"error|fail|reformat|assert|black|flake8|pytest|docker|\b[A-Z]\d{3}\b", re.IGNORECASE)
+
+# CI log patterns, compiled once rather than on every parse
+_BLACK_RE = re.compile(r"would reformat (\S+\.py)", re.IGNORECASE)
+_FLAKE8_RE = re.compile(r"(\S+\.py):(\d+):\d+:\s*([A-Z]\d+)\s+(.+)")
+_PYTEST_FAILED_RE = re.compile(r"FAILED\s+(\S+\.py)::(\S+)\s*[-–]\s*(.+)")
+_ASSERTION_RE = re.compile(r"(AssertionError:.+)")
+_BUILD_ERROR_RE = re.compile(r"(ERROR|error).*?:(.+)", re.IGNORECASE)
+# Error summary patterns, in priority order. (Case-insensitive "Error:" and
+# "failed:" variants are already covered by these two.)
+_ERROR_SUMMARY_RES = (
+    re.compile(r"error:\s*(.+)", re.IGNORECASE),
+    re.compile(r"FAILED\s*(.+)", re.IGNORECASE),
+)
+# Workflow run ID in a GitHub Actions check's details URL (.../actions/runs/<id>/job/<job>)
+_RUN_ID_RE = re.compile(r"/actions/runs/(\d+)")
+_FLAKE8_CODE_RE = re.compile(r"(\d+\s+flake8 errors:|([A-Z]\d+))")
+
+# How to auto-fix a flake8 error code when the failing file is known:
+# append the missing final newline, or let Black reformat the file
+_FLAKE8_FIX_ACTIONS: Dict[str, str] = {
+    "W292": "newline",
+    "E302": "black_code",
+    "E303": "black_code",
+    "W291": "black_code",
+    "W293": "black_code",
+    "W391": "black_code",
+}
+# Errors that need Claude to fix
+_NEEDS_CLAUDE_CODES = frozenset({"E741", "F401", "F841", "E722", "E711", "E712"})
+
 
 class CIStatus(Enum):
     """Status of CI checks on a PR."""
@@ -37,6 +80,7 @@ class CICheck:
     details_url: Optional[str] = None
     started_at: Optional[str] = None
     completed_at: Optional[str] = None
+    run_id: Optional[int] = None  # Workflow run, for GitHub Actions checks
 
 
 @dataclass
@@ -71,23 +115,74 @@ class PRMonitorWorker(BaseWorker):
     Uses gh CLI to check PR status and fetch failure logs.
     """
 
+    # Seconds a fetched PR status is reused before asking gh again
+    PR_STATUS_TTL = 5.0
+    # Longest wait between CI polls, and the least after GitHub throttles us
+    MAX_POLL_INTERVAL = 300
+    RATE_LIMIT_WAIT = 60
+    # Failed-check logs downloaded at once by get_failure_details
+    MAX_CONCURRENT_LOG_FETCHES = 4
+    # Filtered log text kept (from the end) of a streamed CI log
+    FILTERED_LOG_CHARS = 65536
+    # Unfiltered lines kept before and after each filtered line, so
+    # traceback frames and assertion context survive the filter
+    LOG_CONTEXT_LINES = 10
+    # Trailing part of a CI log that failure parsing looks at
+    LOG_WINDOW_CHARS = 32768
+    # Leading part of a CI log kept as a failure's raw_log
+    LOG_HEAD_CHARS = 2000
+    # Shared across workers: at most one gh call per GH_MIN_INTERVAL seconds,
+    # and none before _gh_resume_at (monotonic) after GitHub throttles us
+    GH_MIN_INTERVAL = 1.0
+    _gh_lock: Optional[asyncio.Lock] = None
+    _gh_next_slot = 0.0
+    _gh_resume_at = 0.0
+    _gh_limits_checked = False
+
     def __init__(self, session, codebase_path: Optional[Path] = None):
         super().__init__(session, codebase_path)
+        # pr_number -> (monotonic fetch time, PRStatus)
+        self._pr_status_cache: Dict[int, Tuple[float, PRStatus]] = {}
+        # Error output of the last failed gh call, for rate-limit detection
+        self._last_gh_error = ""
 
     async def get_pr_status(self, pr_number: int) -> Optional[PRStatus]:
         """
         Get the current CI status of a PR.
 
+        A status fetched less than PR_STATUS_TTL seconds ago is reused, so
+        back-to-back callers share one `gh pr view`.
+
         Args:
             pr_number: The PR number to check
 
         Returns:
             PRStatus with all check information, or None if failed
         """
+        cached = self._pr_status_cache.get(pr_number)
+        if cached is not None and time.monotonic() - cached[0] < self.PR_STATUS_TTL:
+            # Copy so callers can't alter the cached entry
+            status = cached[1]
+            return dataclasses.replace(status, checks=list(status.checks), failures=list(status.failures))
+
+        pr_status = await self._fetch_pr_status(pr_number)
+        if pr_status is None:
+            self._pr_status_cache.pop(pr_number, None)
+        else:
+            self._pr_status_cache[pr_number] = (
+                time.monotonic(),
+                dataclasses.replace(pr_status, checks=list(pr_status.checks), failures=[]),
+            )
+        return pr_status
+
+    async def _fetch_pr_status(self, pr_number: int) -> Optional[PRStatus]:
+        """Fetch a PR's CI status from gh (uncached)."""
         self.log(f"Checking CI status for PR #{pr_number}")
 
         # Get PR info and checks
-        result = await self.run_command(f"gh pr view {pr_number} --json number,url,headRefName,statusCheckRollup")
+        result = await self._run_gh(
+            ["gh", "pr", "view", str(pr_number), "--json", "number,url,headRefName,statusCheckRollup"]
+        )
 
         if not result.success:
             self.log(f"Failed to get PR status: {result.error}", "error")
@@ -135,14 +230,17 @@ class PRMonitorWorker(BaseWorker):
                 ci_status = CIStatus.UNKNOWN
                 all_success = False
 
+            details_url = check.get("detailsUrl")
+            run_match = _RUN_ID_RE.search(details_url or "")
             pr_status.checks.append(
                 CICheck(
                     name=check.get("name", check.get("context", "unknown")),
                     status=ci_status,
                     conclusion=conclusion,
-                    details_url=check.get("detailsUrl"),
+                    details_url=details_url,
                     started_at=check.get("startedAt"),
                     completed_at=check.get("completedAt"),
+                    run_id=int(run_match.group(1)) if run_match else None,
                 )
             )
 
@@ -159,12 +257,13 @@ class PRMonitorWorker(BaseWorker):
         self.log(f"PR #{pr_number} status: {pr_status.overall_status.value}")
         return pr_status
 
-    async def get_failure_details(self, pr_number: int) -> List[CIFailure]:
+    async def get_failure_details(self, pr_number: int, pr_status: Optional[PRStatus] = None) -> List[CIFailure]:
         """
         Get detailed failure information from CI logs.
 
         Args:
             pr_number: The PR number to check
+            pr_status: Already-fetched status for the PR, if the caller has one
 
         Returns:
             List of CIFailure objects with parsed error details
@@ -173,76 +272,108 @@ class PRMonitorWorker(BaseWorker):
         failures = []
 
         # Get the failed checks
-        pr_status = await self.get_pr_status(pr_number)
+        if pr_status is None:
+            pr_status = await self.get_pr_status(pr_number)
         if not pr_status:
             return failures
 
         failed_checks = [c for c in pr_status.checks if c.status == CIStatus.FAILURE]
+        if not failed_checks:
+            return failures
 
-        for check in failed_checks:
-            # Try to get the run ID from the check
-            failure = await self._analyze_check_failure(pr_number, check)
-            if failure:
-                failures.append(failure)
+        # Actions checks already name their run; otherwise one run listing
+        # is shared by every failed check
+        runs = None
+        if any(check.run_id is None for check in failed_checks):
+            runs = await self._list_recent_runs()
 
-        return failures
+        # Analyze checks concurrently, a few at a time (logs can be large);
+        # checks that map to the same run share one log download
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_LOG_FETCHES)
+        log_fetches: Dict[int, asyncio.Task] = {}
 
-    async def _analyze_check_failure(self, pr_number: int, check: CICheck) -> Optional[CIFailure]:
-        """Analyze a single check failure."""
-        self.log(f"Analyzing failure: {check.name}")
+        async def analyze(check: CICheck) -> Optional[CIFailure]:
+            async with semaphore:
+                return await self._analyze_check_failure(pr_number, check, runs, log_fetches)
 
-        # Get workflow run logs using gh CLI
-        # First, find the run ID for this PR
-        result = await self.run_command(
-            f"gh run list --branch {self.session.branch_name} --limit 5 --json databaseId,conclusion,name,status"
+        results = await asyncio.gather(*(analyze(check) for check in failed_checks))
+        failures.extend(failure for failure in results if failure)
+
+        return failures
+
+    async def _list_recent_runs(self) -> Optional[List[dict]]:
+        """List recent workflow runs on the session branch, or None on failure."""
+        result = await self._run_gh(
+            ["gh", "run", "list", "--branch", self.session.branch_name, "--limit", "20"]
+            + ["--json", "databaseId,conclusion,name,status"]
         )
 
         if not result.success:
             self.log(f"Failed to list runs: {result.error}", "error")
-            return CIFailure(
-                check_name=check.name,
-                failure_type="unknown",
-                error_message=f"Check failed: {check.conclusion}",
-            )
+            return None
 
         try:
-            runs = json.loads(result.message)
+            return json.loads(result.message)
         except json.JSONDecodeError:
-            return CIFailure(
-                check_name=check.name,
-                failure_type="unknown",
-                error_message=f"Check failed: {check.conclusion}",
-            )
-
-        # Find the failed run
-        failed_run = None
-        for run in runs:
-            if run.get("conclusion") == "failure":
-                failed_run = run
-                break
+            return None
 
-        if not failed_run:
-            return CIFailure(
-                check_name=check.name,
-                failure_type="unknown",
-                error_message=f"Check failed: {check.conclusion}",
-            )
+    async def _analyze_check_failure(
+        self,
+        pr_number: int,
+        check: CICheck,
+        runs: Optional[List[dict]],
+        log_fetches: Optional[Dict[int, asyncio.Task]] = None,
+    ) -> Optional[CIFailure]:
+        """
+        Analyze a single check failure, given the branch's recent runs
+        (only used if the check doesn't carry its run ID).
 
-        run_id = failed_run.get("databaseId")
+        log_fetches maps run IDs to in-flight log downloads so concurrent
+        analyses of checks from the same run fetch its log only once.
+        """
+        self.log(f"Analyzing failure: {check.name}")
 
-        # Get the logs for this run
-        result = await self.run_command(f"gh run view {run_id} --log-failed", timeout=60)
+        run_id = check.run_id
+        if run_id is None:
+            # Find the failed run - the one named like the check if there is
+            # one, otherwise the most recent failure
+            failed_runs = [run for run in runs or [] if run.get("conclusion") == "failure"]
+            failed_run = next((run for run in failed_runs if run.get("name") == check.name), None)
+            if failed_run is None and failed_runs:
+                failed_run = failed_runs[0]
+
+            if not failed_run:
+                return CIFailure(
+                    check_name=check.name,
+                    failure_type="unknown",
+                    error_message=f"Check failed: {check.conclusion}",
+                )
 
-        if not result.success:
-            # Try without --log-failed
-            result = await self.run_command(f"gh run view {run_id} --log", timeout=60)
+            run_id = failed_run.get("databaseId")
 
-        log_content = result.message if result.success else ""
+        # Get the logs for this run
+        if log_fetches is None:
+            log_fetches = {}
+        fetch = log_fetches.get(run_id)
+        if fetch is None:
+            fetch = log_fetches[run_id] = asyncio.ensure_future(self._fetch_run_log(run_id))
+        log_content = await fetch
 
         # Parse the failure from logs
         failure = self._parse_failure_log(check.name, log_content)
         return failure
 
+    async def _fetch_run_log(self, run_id: int) -> str:
+        """Download the failed-step log for a workflow run ("" if unavailable)."""
+        # Try without --log-failed if it produced nothing
+        for log_flag in ("--log-failed", "--log"):
+            filtered, excerpt = await self._stream_gh_log(["gh", "run", "view", str(run_id), log_flag])
+            # Usually only error/lint/test lines are needed; if none matched,
+            # parse the log's head and tail instead
+            if filtered or excerpt:
+                return filtered or excerpt
+        return ""
+
     def _parse_failure_log(self, check_name: str, log_content: str) -> CIFailure:
         """
         Parse CI log content to extract failure details.
@@ -255,22 +386,27 @@ class PRMonitorWorker(BaseWorker):
         """
         check_lower = check_name.lower()
 
+        # Parse only the tail of huge logs - CI errors are reported at the end
+        window = log_content[-self.LOG_WINDOW_CHARS :] if len(log_content) > self.LOG_WINDOW_CHARS else log_content
+        window_lower = window.lower()
+        raw_log = log_content[: self.LOG_HEAD_CHARS] if log_content else None
+
         # Detect failure type
-        if "lint" in check_lower or "black" in log_content.lower():
-            return self._parse_lint_failure(check_name, log_content)
-        elif "test" in check_lower or "pytest" in log_content.lower():
-            return self._parse_test_failure(check_name, log_content)
-        elif "build" in check_lower or "docker" in log_content.lower():
-            return self._parse_build_failure(check_name, log_content)
+        if "lint" in check_lower or "black" in window_lower:
+            return self._parse_lint_failure(check_name, window, raw_log)
+        elif "test" in check_lower or "pytest" in window_lower:
+            return self._parse_test_failure(check_name, window, raw_log)
+        elif "build" in check_lower or "docker" in window_lower:
+            return self._parse_build_failure(check_name, window, raw_log)
         else:
             return CIFailure(
                 check_name=check_name,
                 failure_type="unknown",
-                error_message=self._extract_error_summary(log_content),
-                raw_log=log_content[:2000] if log_content else None,
+                error_message=self._extract_error_summary(window),
+                raw_log=raw_log,
             )
 
-    def _parse_lint_failure(self, check_name: str, log_content: str) -> CIFailure:
+    def _parse_lint_failure(self, check_name: str, log_content: str, raw_log: Optional[str]) -> CIFailure:
         """Parse lint/formatting failures (Black, flake8)."""
         error_message = ""
         file_path = None
@@ -278,37 +414,34 @@ class PRMonitorWorker(BaseWorker):
         failure_type = "lint"  # Default, may be refined to "black" or "flake8"
 
         # Black formatting failure pattern
-        black_match = re.search(r"would reformat (\S+\.py)", log_content, re.IGNORECASE)
+        black_match = _BLACK_RE.search(log_content)
         if black_match:
             file_path = black_match.group(1)
             error_message = f"File needs Black formatting: {file_path}"
             failure_type = "black"
 
         # Flake8 error pattern: path/to/file.py:42:1: E501 line too long
-        # Collect ALL flake8 errors for reporting
-        flake8_errors = re.findall(r"(\S+\.py):(\d+):\d+:\s*([A-Z]\d+)\s+(.+)", log_content)
-        if flake8_errors:
+        # Count ALL flake8 errors for reporting
+        flake8_errors = _FLAKE8_RE.finditer(log_content)
+        first_error = next(flake8_errors, None)
+        if first_error:
             # Get the first error for file_path and line_number
-            first_error = flake8_errors[0]
-            file_path = first_error[0]
-            line_number = int(first_error[1])
-            error_code = first_error[2]
-            error_desc = first_error[3]
+            file_path, line, error_code, error_desc = first_error.groups()
+            line_number = int(line)
             error_message = f"{error_code} {error_desc}"
             failure_type = "flake8"
 
             # If multiple errors, note that in the message
-            if len(flake8_errors) > 1:
-                error_message = (
-                    f"{len(flake8_errors)} flake8 errors: {error_code} {error_desc} (and {len(flake8_errors)-1} more)"
-                )
+            error_count = 1 + sum(1 for _ in flake8_errors)
+            if error_count > 1:
+                error_message = f"{error_count} flake8 errors: {error_code} {error_desc} (and {error_count-1} more)"
 
         if not error_message:
             # Try to find any error line
-            error_lines = [
-                line for line in log_content.split("\n") if "error" in line.lower() or "failed" in line.lower()
-            ]
-            error_message = error_lines[0] if error_lines else "Lint check failed"
+            error_message = next(
+                (line for line in log_content.split("\n") if "error" in line.lower() or "failed" in line.lower()),
+                "Lint check failed",
+            )
 
         return CIFailure(
             check_name=check_name,
@@ -316,17 +449,17 @@ class PRMonitorWorker(BaseWorker):
             error_message=error_message,
             file_path=file_path,
             line_number=line_number,
-            raw_log=log_content[:2000] if log_content else None,
+            raw_log=raw_log,
         )
 
-    def _parse_test_failure(self, check_name: str, log_content: str) -> CIFailure:
+    def _parse_test_failure(self, check_name: str, log_content: str, raw_log: Optional[str]) -> CIFailure:
         """Parse test failures (pytest)."""
         error_message = ""
         file_path = None
         line_number = None
 
         # Pytest failure pattern: FAILED tests/test_foo.py::test_bar - AssertionError
-        pytest_match = re.search(r"FAILED\s+(\S+\.py)::(\S+)\s*[-–]\s*(.+)", log_content)
+        pytest_match = _PYTEST_FAILED_RE.search(log_content)
         if pytest_match:
             file_path = pytest_match.group(1)
             test_name = pytest_match.group(2)
@@ -335,7 +468,7 @@ class PRMonitorWorker(BaseWorker):
 
         # Look for assertion errors
         if not error_message:
-            assert_match = re.search(r"(AssertionError:.+)", log_content)
+            assert_match = _ASSERTION_RE.search(log_content)
             if assert_match:
                 error_message = assert_match.group(1)
 
@@ -348,15 +481,15 @@ class PRMonitorWorker(BaseWorker):
             error_message=error_message,
             file_path=file_path,
             line_number=line_number,
-            raw_log=log_content[:2000] if log_content else None,
+            raw_log=raw_log,
         )
 
-    def _parse_build_failure(self, check_name: str, log_content: str) -> CIFailure:
+    def _parse_build_failure(self, check_name: str, log_content: str, raw_log: Optional[str]) -> CIFailure:
         """Parse build failures (Docker, etc.)."""
         error_message = ""
 
         # Docker build error patterns
-        docker_match = re.search(r"(ERROR|error).*?:(.+)", log_content, re.IGNORECASE)
+        docker_match = _BUILD_ERROR_RE.search(log_content)
         if docker_match:
             error_message = docker_match.group(2).strip()
 
@@ -367,7 +500,7 @@ class PRMonitorWorker(BaseWorker):
             check_name=check_name,
             failure_type="build",
             error_message=error_message,
-            raw_log=log_content[:2000] if log_content else None,
+            raw_log=raw_log,
         )
 
     def _extract_error_summary(self, log_content: str) -> str:
@@ -376,15 +509,8 @@ class PRMonitorWorker(BaseWorker):
             return "Unknown error"
 
         # Look for common error patterns
-        patterns = [
-            r"error:\s*(.+)",
-            r"Error:\s*(.+)",
-            r"FAILED\s*(.+)",
-            r"failed:\s*(.+)",
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, log_content, re.IGNORECASE)
+        for pattern in _ERROR_SUMMARY_RES:
+            match = pattern.search(log_content)
             if match:
                 return match.group(1).strip()[:200]
 
@@ -408,18 +534,21 @@ class PRMonitorWorker(BaseWorker):
         Args:
             pr_number: The PR number to monitor
             timeout_minutes: Maximum time to wait
-            poll_interval_seconds: Time between status checks
+            poll_interval_seconds: Initial time between status checks; doubles
+                (with jitter, up to MAX_POLL_INTERVAL) while the status is unchanged
 
         Returns:
             Final PRStatus after CI completes or timeout
         """
         self.log(f"Waiting for CI on PR #{pr_number} (timeout: {timeout_minutes}m)")
 
-        start_time = datetime.now()
+        start_time = time.monotonic()
         timeout_seconds = timeout_minutes * 60
+        last_status = None
+        unchanged_polls = 0
 
         while True:
-            elapsed = (datetime.now() - start_time).total_seconds()
+            elapsed = time.monotonic() - start_time
             if elapsed > timeout_seconds:
                 self.log(f"CI timeout after {timeout_minutes} minutes", "warning")
                 status = await self.get_pr_status(pr_number)
@@ -429,18 +558,156 @@ class PRMonitorWorker(BaseWorker):
 
             status = await self.get_pr_status(pr_number)
             if not status:
-                self.log("Failed to get PR status, retrying...", "warning")
-                await asyncio.sleep(poll_interval_seconds)
+                delay = self._rate_limit_wait(self._last_gh_error) or poll_interval_seconds
+                self.log(f"Failed to get PR status, retrying in {delay:.0f}s...", "warning")
+                await asyncio.sleep(min(delay, max(0.0, timeout_seconds - elapsed)))
                 continue
 
             if status.overall_status in (CIStatus.SUCCESS, CIStatus.FAILURE):
                 self.log(f"CI completed with status: {status.overall_status.value}")
                 if status.overall_status == CIStatus.FAILURE:
-                    status.failures = await self.get_failure_details(pr_number)
+                    status.failures = await self.get_failure_details(pr_number, status)
                 return status
 
-            self.log(f"CI status: {status.overall_status.value}, " f"waiting {poll_interval_seconds}s...")
-            await asyncio.sleep(poll_interval_seconds)
+            # Back off while nothing changes; start over on any transition
+            if status.overall_status != last_status:
+                last_status = status.overall_status
+                unchanged_polls = 0
+            delay = min(poll_interval_seconds * 2**unchanged_polls, self.MAX_POLL_INTERVAL)
+            delay *= random.uniform(0.8, 1.2)
+            unchanged_polls += 1
+
+            self.log(f"CI status: {status.overall_status.value}, " f"waiting {delay:.0f}s...")
+            await asyncio.sleep(min(delay, max(0.0, timeout_seconds - elapsed)))
+
+    async def _run_gh(self, command: Sequence[str], timeout: int = 300) -> WorkerResult:
+        """
+        Run a gh command under the shared GitHub throttle.
+
+        Calls are spaced GH_MIN_INTERVAL apart across all monitors, and held
+        back entirely while GitHub's rate limit is exhausted.
+        """
+        cls = PRMonitorWorker
+        await self._wait_for_gh_slot()
+
+        result = await self.run_command(command, timeout=timeout)
+        if not result.success:
+            self._last_gh_error = f"{result.error}\n{result.message}"
+            wait = self._rate_limit_wait(self._last_gh_error)
+            if wait is not None:
+                self.log(f"GitHub rate limit hit, pausing gh calls for {wait:.0f}s", "warning")
+                cls._gh_resume_at = max(cls._gh_resume_at, time.monotonic() + wait)
+        return result
+
+    async def _wait_for_gh_slot(self):
+        """Wait until the shared throttle allows another gh call, and claim it."""
+        cls = PRMonitorWorker
+        if cls._gh_lock is None:
+            cls._gh_lock = asyncio.Lock()
+
+        async with cls._gh_lock:
+            if not cls._gh_limits_checked:
+                cls._gh_limits_checked = True
+                await self._check_rate_limit()
+            now = time.monotonic()
+            start = max(now, cls._gh_next_slot, cls._gh_resume_at)
+            cls._gh_next_slot = start + self.GH_MIN_INTERVAL
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def _stream_gh_log(self, command: Sequence[str], timeout: int = 60) -> Tuple[str, str]:
+        """
+        Run a gh command that prints a CI log, reading it in a single pass.
+
+        Returns (filtered, excerpt): the output lines that failure parsing
+        uses, each with up to LOG_CONTEXT_LINES lines of context on either
+        side and "..." where lines were skipped (the last FILTERED_LOG_CHARS
+        of them, since failures are reported at the end of a log), and the
+        log's first
+        LOG_HEAD_CHARS and last LOG_WINDOW_CHARS joined - everything
+        _parse_failure_log looks at. Lines are handled as they stream in, so
+        a multi-megabyte log is never held in memory. Both are "" if gh
+        printed nothing.
+        """
+        await self._wait_for_gh_slot()
+
+        kept: Deque[str] = deque()
+        kept_size = 0
+        before: Deque[str] = deque(maxlen=self.LOG_CONTEXT_LINES)
+        after = 0
+        last_kept = -1
+        head: List[str] = []
+        head_size = 0
+        tail: Deque[str] = deque()
+        tail_size = 0
+        truncated = False
+
+        def keep(line: str):
+            nonlocal kept_size
+            kept.append(line)
+            kept_size += len(line) + 1
+            while kept_size - len(kept[0]) - 1 >= self.FILTERED_LOG_CHARS:
+                kept_size -= len(kept.popleft()) + 1
+
+        lines = self.stream_command(command, timeout=timeout)
+        try:
+            index = -1
+            async for line in lines:
+                index += 1
+                if _LOG_FILTER_RE.search(line):
+                    if kept and index - len(before) > last_kept + 1:
+                        keep("...")
+                    for context in before:
+                        keep(context)
+                    before.clear()
+                    keep(line)
+                    last_kept = index
+                    after = self.LOG_CONTEXT_LINES
+                elif after:
+                    keep(line)
+                    last_kept = index
+                    after -= 1
+                else:
+                    before.append(line)
+
+                if head_size < self.LOG_HEAD_CHARS:
+                    head.append(line)
+                    head_size += len(line) + 1
+                    continue
+                tail.append(line)
+                tail_size += len(line) + 1
+                # Drop leading lines the window no longer reaches
+                while tail_size - len(tail[0]) - 1 >= self.LOG_WINDOW_CHARS:
+                    tail_size -= len(tail.popleft()) + 1
+                    truncated = True
+        finally:
+            await lines.aclose()
+
+        if kept:
+            return "\n".join(kept), ""
+        excerpt = head + ["..."] + list(tail) if truncated else head + list(tail)
+        return "", "\n".join(excerpt).strip()
+
+    async def _check_rate_limit(self):
+        """Read the remaining API quota once and pause gh calls if it's used up."""
+        result = await self.run_command(["gh", "api", "-i", "rate_limit"], timeout=30)
+        if not result.success:
+            return
+        remaining = _RATELIMIT_REMAINING_RE.search(result.message)
+        reset = _RATELIMIT_RESET_RE.search(result.message)
+        if remaining and reset and int(remaining.group(1)) == 0:
+            wait = int(reset.group(1)) - time.time()
+            if wait > 0:
+                self.log(f"GitHub API quota exhausted, pausing gh calls for {wait:.0f}s", "warning")
+                PRMonitorWorker._gh_resume_at = time.monotonic() + wait
+
+    def _rate_limit_wait(self, error_output: str) -> Optional[float]:
+        """Seconds to wait if gh output shows GitHub rate limiting, else None."""
+        if "rate limit" not in error_output.lower():
+            return None
+        match = _RETRY_AFTER_RE.search(error_output)
+        retry_after = int(match.group(1)) if match else 0
+        return float(max(self.RATE_LIMIT_WAIT, retry_after))
 
     async def fix_lint_failure(self, failure: CIFailure) -> WorkerResult:
         """
@@ -455,99 +722,182 @@ class PRMonitorWorker(BaseWorker):
         Returns:
             WorkerResult indicating success/failure
         """
-        self.log(f"Attempting to fix lint failure: {failure.error_message}")
-
-        # Handle Black formatting failures
-        if failure.failure_type == "black" or "reformat" in failure.error_message.lower():
-            if failure.file_path:
-                cmd = f'python -m black "{failure.file_path}"'
-            else:
-                cmd = "python -m black ."
+        return (await self.fix_lint_failures([failure]))[0]
 
-            result = await self.run_command(cmd)
-            if result.success:
-                self.log("Black formatting applied successfully")
-                return WorkerResult(success=True, message="Applied Black formatting")
-            else:
-                return WorkerResult(
-                    success=False,
-                    error=f"Black formatting failed: {result.error}",
-                )
+    async def fix_lint_failures(self, failures: List[CIFailure]) -> List[WorkerResult]:
+        """
+        Attempt to fix several lint failures together.
 
-        # Handle flake8 errors
-        if failure.failure_type == "flake8":
-            return await self._fix_flake8_error(failure)
+        Same fixes as fix_lint_failure, but every file that needs Black is
+        formatted by a single Black run, and files that need re-checking are
+        linted by a single flake8 run, instead of one of each per failure.
 
-        # For other lint failures, return failure - needs Claude analysis
-        return WorkerResult(
-            success=False,
-            error=f"Cannot auto-fix lint error: {failure.error_message}",
-        )
+        Args:
+            failures: The CIFailures to fix
 
-    async def _fix_flake8_error(self, failure: CIFailure) -> WorkerResult:
+        Returns:
+            One WorkerResult per failure, in the same order
         """
-        Attempt to fix a flake8 error.
+        # Decide how to fix each failure: (action, flake8 error code)
+        plans = []
+        for failure in failures:
+            self.log(f"Attempting to fix lint failure: {failure.error_message}")
+            plans.append(self._plan_lint_fix(failure))
+
+        # Missing final newlines are fixed in place; if that fails, fall back
+        # to Black + flake8 like any other unrecognised error
+        for i, (failure, (action, error_code)) in enumerate(zip(failures, plans)):
+            if action == "newline" and not await self._append_newline(failure.file_path):
+                plans[i] = ("verify", error_code)
+
+        # One Black run over every file that needs it
+        black_files = {
+            failure.file_path
+            for failure, (action, _) in zip(failures, plans)
+            if action in ("black", "black_code", "verify") and failure.file_path
+        }
+        format_all = any(action == "black" and not f.file_path for f, (action, _) in zip(failures, plans))
+        black_errors = await self._run_black(sorted(black_files), format_all) if black_files or format_all else {}
+
+        # One flake8 run over the files whose fix has to be verified
+        verify_files = {
+            failure.file_path
+            for failure, (action, _) in zip(failures, plans)
+            if action == "verify" and failure.file_path not in black_errors
+        }
+        flake8_failed = await self._run_flake8(sorted(verify_files)) if verify_files else set()
+
+        results = []
+        for failure, (action, error_code) in zip(failures, plans):
+            error_msg = failure.error_message
+            black_error = black_errors.get(failure.file_path or ".")
+
+            if action == "black":
+                if black_error is None:
+                    self.log("Black formatting applied successfully")
+                    results.append(WorkerResult(success=True, message="Applied Black formatting"))
+                else:
+                    results.append(WorkerResult(success=False, error=f"Black formatting failed: {black_error}"))
+            elif action == "unsupported":
+                # For other lint failures, return failure - needs Claude analysis
+                results.append(WorkerResult(success=False, error=f"Cannot auto-fix lint error: {error_msg}"))
+            elif action == "newline":
+                results.append(WorkerResult(success=True, message="Added newline at end of file"))
+            elif action == "black_code" and black_error is None:
+                results.append(WorkerResult(success=True, message=f"Fixed {error_code} with Black"))
+            elif action == "claude":
+                # For errors that need Claude, return failure so _fix_ci_failure_with_claude handles it
+                results.append(
+                    WorkerResult(
+                        success=False,
+                        error=f"Flake8 {error_code} requires Claude analysis: {error_msg}",
+                        data={"needs_claude": True, "error_code": error_code},
+                    )
+                )
+            elif action == "verify" and black_error is None and failure.file_path not in flake8_failed:
+                results.append(WorkerResult(success=True, message="Fixed with Black"))
+            else:
+                results.append(
+                    WorkerResult(
+                        success=False,
+                        error=f"Cannot auto-fix flake8 error {error_code}: {error_msg}",
+                        data={"needs_claude": True, "error_code": error_code},
+                    )
+                )
 
-        Some errors can be auto-fixed, others need Claude analysis.
+        return results
 
-        Args:
-            failure: The CIFailure containing flake8 error details
+    def _plan_lint_fix(self, failure: CIFailure) -> Tuple[str, str]:
+        """
+        Choose how to fix a lint failure.
 
-        Returns:
-            WorkerResult indicating success/failure
+        Returns (action, flake8 error code), where action is one of:
+        black (Black formatting failure), unsupported (other non-flake8 lint
+        failure), newline (append a final newline), black_code (flake8 error
+        Black fixes), claude (needs Claude), verify (unknown error - try Black,
+        then re-run flake8) or fail (no file to fix).
         """
-        error_msg = failure.error_message
+        # Handle Black formatting failures
+        if failure.failure_type == "black" or "reformat" in failure.error_message.lower():
+            return "black", ""
+
+        if failure.failure_type != "flake8":
+            return "unsupported", ""
 
         # Extract error code from message (e.g., "E741 ambiguous variable name 'l'")
-        code_match = re.match(r"(\d+\s+flake8 errors:|([A-Z]\d+))", error_msg)
+        code_match = _FLAKE8_CODE_RE.match(failure.error_message)
         error_code = code_match.group(2) if code_match and code_match.group(2) else ""
 
-        # Errors that Black can typically fix
-        black_fixable = {"E302", "E303", "W291", "W293", "W391"}
-
-        # Errors that need Claude to fix
-        needs_claude_codes = {"E741", "F401", "F841", "E722", "E711", "E712"}
-
-        if error_code in ["W291", "W293"]:
-            # Remove trailing whitespace - we can fix this with sed/Black
-            if failure.file_path:
-                result = await self.run_command(f'python -m black "{failure.file_path}"')
-                if result.success:
-                    return WorkerResult(success=True, message=f"Fixed {error_code} with Black")
-
-        if error_code == "W292":
-            # Add newline at end of file
-            if failure.file_path:
-                result = await self.run_command(f'echo "" >> "{failure.file_path}"')
-                if result.success:
-                    return WorkerResult(success=True, message="Added newline at end of file")
-
-        if error_code in black_fixable:
-            # Black can often fix these
-            if failure.file_path:
-                result = await self.run_command(f'python -m black "{failure.file_path}"')
-                if result.success:
-                    return WorkerResult(success=True, message=f"Fixed {error_code} with Black")
-
-        # For errors that need Claude, return failure so _fix_ci_failure_with_claude handles it
-        if error_code in needs_claude_codes:
-            return WorkerResult(
-                success=False,
-                error=f"Flake8 {error_code} requires Claude analysis: {error_msg}",
-                data={"needs_claude": True, "error_code": error_code},
-            )
+        if failure.file_path:
+            action = _FLAKE8_FIX_ACTIONS.get(error_code)
+            if action:
+                return action, error_code
+
+        if error_code in _NEEDS_CLAUDE_CODES:
+            return "claude", error_code
 
-        # Unknown error - try Black first, then fail
+        # Unknown error - try Black first, then check with flake8
         if failure.file_path:
-            result = await self.run_command(f'python -m black "{failure.file_path}"')
-            if result.success:
-                # Run flake8 to see if it's fixed
-                check_result = await self.run_command(f'python -m flake8 "{failure.file_path}" --max-line-length=120')
-                if check_result.success:
-                    return WorkerResult(success=True, message="Fixed with Black")
-
-        return WorkerResult(
-            success=False,
-            error=f"Cannot auto-fix flake8 error {error_code}: {error_msg}",
-            data={"needs_claude": True, "error_code": error_code},
-        )
+            return "verify", error_code
+
+        return "fail", error_code
+
+    async def _append_newline(self, file_path: str) -> bool:
+        """Add a newline at the end of a file."""
+
+        def append():
+            with open(self.codebase_path / file_path, "a", encoding="utf-8") as f:
+                f.write("\n")
+
+        try:
+            await asyncio.to_thread(append)
+            return True
+        except OSError as e:
+            self.log(f"Error appending newline to {file_path}: {e}", "error")
+            return False
+
+    async def _run_black(self, files: List[str], format_all: bool = False) -> Dict[str, str]:
+        """
+        Format files with one Black run (the whole tree if format_all).
+
+        Returns {file: error} for files Black couldn't format; "." stands
+        for the whole tree. Empty if everything was formatted.
+        """
+        # Black aborts the whole run on a missing path, so report those here
+        errors = {f: f"Path '{f}' does not exist" for f in files if not (self.codebase_path / f).exists()}
+        files = [f for f in files if f not in errors]
+        if not files and not format_all:
+            return errors
+
+        result = await self.run_command(["python", "-m", "black", *(["."] if format_all else files)])
+        if result.success:
+            return errors
+
+        output = f"{result.error}\n{result.message}"
+        failed = {}
+        for line in output.split("\n"):
+            for prefix in ("error: cannot format ", "error: cannot parse: "):
+                if line.startswith(prefix):
+                    rest = line[len(prefix) :]
+                    for file in files:
+                        # "<file>: reason" or "<file>:line:col"
+                        if rest.startswith(file) and rest[len(file) : len(file) + 1] in ("", ":", " "):
+                            failed.setdefault(file, line)
+
+        if not failed:
+            # Black itself failed (e.g. not installed) - nothing was formatted
+            failed = dict.fromkeys(files, result.error)
+        errors.update(failed)
+        if format_all:
+            errors["."] = result.error
+        return errors
+
+    async def _run_flake8(self, files: List[str]) -> set:
+        """Lint files with one flake8 run; returns the files that still have errors."""
+        result = await self.run_command(["python", "-m", "flake8", *files, "--max-line-length=120"])
+        if result.success:
+            return set()
+
+        failed = {line.split(":", 1)[0] for line in result.message.split("\n")} & set(files)
+        # No per-file output means flake8 itself failed - treat every file as failing
+        return failed or set(files)
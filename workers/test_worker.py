@@ -2,11 +2,44 @@
 Test Worker - Runs tests and validation
 """
 
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shlex
+from collections import deque
 from pathlib import Path
-from typing import Optional, List
+from typing import Awaitable, Deque, Dict, FrozenSet, Optional, List, Set, Tuple, TypeVar
 from dataclasses import dataclass, field
 
-from .base_worker import BaseWorker
+try:
+    # Optional: faster JSON parsing straight from bytes
+    import orjson
+except ImportError:
+    orjson = None
+
+from .base_worker import BaseWorker, WorkerResult
+
+_FAILED_TEST_RE = re.compile(r"FAILED (.+?) -")
+_ISSUE_COUNT_RE = re.compile(r"Total issues found: (\d+)")
+
+T = TypeVar("T")
+
+# Compiles each file named in argv, in memory (no .pyc files), and prints a
+# JSON object mapping each file that failed to its error
+_SYNTAX_CHECK_SCRIPT = """
+import json, sys
+
+errors = {}
+for path in sys.argv[1:]:
+    try:
+        with open(path, "rb") as f:
+            compile(f.read(), path, "exec", dont_inherit=True)
+    except (SyntaxError, ValueError, OSError) as e:
+        errors[path] = str(e)
+print(json.dumps(errors))
+"""
 
 
 @dataclass
@@ -29,8 +62,48 @@ class TestWorker(BaseWorker):
     Can run pytest, black, flake8, mypy, and re-run test agents.
     """
 
+    # Lint checks run alongside pytest: name -> (description, argv run from
+    # the venv, directories the check doesn't look at)
+    LINT_CHECKS = {
+        "black": (
+            "black formatting check",
+            ("python", "-m", "black", "--check", "--diff", "."),
+            frozenset({"venv", "__pycache__", ".git"}),
+        ),
+        "flake8": (
+            "flake8 lint check",
+            ("python", "-m", "flake8", ".", "--max-line-length=120", "--exclude=venv,__pycache__,.git,legacy"),
+            frozenset({"venv", "__pycache__", ".git", "legacy"}),
+        ),
+    }
+    # Files that change what the lint checks report
+    LINT_CONFIG_FILES = ("pyproject.toml", "setup.cfg", ".flake8", "tox.ini")
+    # Trailing pytest output lines kept in TestResult.output
+    PYTEST_OUTPUT_LINES = 500
+    # Issue + code fingerprints already validated as fixed, shared across
+    # workers. Only successes are kept: a "not fixed" verdict from the test
+    # agents may be a flaky run, so it is always re-checked
+    _validated_fixed: Set[str] = set()
+    # Python files fingerprint each lint check last passed on, by (codebase, check)
+    _lint_passed: Dict[Tuple[str, str], str] = {}
+
     def __init__(self, session, codebase_path: Optional[Path] = None):
         super().__init__(session, codebase_path)
+        self._has_xdist: Optional[bool] = None
+        # Caps how many checks run at once as more are added
+        self._check_semaphore = asyncio.Semaphore(os.cpu_count() or 4)
+
+        # Use venv if available (check both Linux and Windows paths)
+        self._venv_prefix = ""
+        venv_linux = self.codebase_path / "venv" / "bin"
+        venv_windows = self.codebase_path / "venv" / "Scripts"
+        if venv_linux.exists():
+            self._venv_prefix = f"{venv_linux}/"
+        elif venv_windows.exists():
+            self._venv_prefix = f"{venv_windows}/"
+
+        # Commands are built once, as argv lists so they run without a shell
+        self._lint_commands = {name: self._venv_command(*command) for name, (_, command, _) in self.LINT_CHECKS.items()}
 
     async def run_all_tests(self) -> TestResult:
         """
@@ -41,43 +114,47 @@ class TestWorker(BaseWorker):
         result = TestResult()
         outputs = []
 
-        # Use venv if available (check both Linux and Windows paths)
-        venv_prefix = ""
-        venv_linux = self.codebase_path / "venv" / "bin"
-        venv_windows = self.codebase_path / "venv" / "Scripts"
-        if venv_linux.exists():
-            venv_prefix = f"{venv_linux}/"
-        elif venv_windows.exists():
-            venv_prefix = f"{venv_windows}/"
-
-        # Run pytest on core tests only (exclude Mastermind-generated tests)
+        # Fingerprint the Python files for the lint checks in the background
+        # while pytest starts - a lint check that passed on exactly the files
+        # it covers would pass again
+        fingerprint_task = asyncio.create_task(asyncio.to_thread(self._python_files_fingerprints))
+
+        # The checks are independent, so run them concurrently. pytest takes
+        # longest, so it starts first
+        # Run pytest on core tests only (exclude Mastermind-generated tests).
+        # Only pass/fail matters here, so stop at the first failure and try
+        # the tests that failed last time first
+        xdist_args = await self._xdist_args()
         self.log("Running pytest on core tests...")
-        pytest_result = await self.run_command(
-            f"{venv_prefix}pytest tests/test_app.py tests/test_database.py -v --tb=short"
+        pytest_command = self._venv_command(
+            "pytest", "tests/test_app.py", "tests/test_database.py", "-v", "--tb=short", "-x", "--ff", *xdist_args
         )
-        result.pytest_passed = pytest_result.success
-        outputs.append(f"=== PYTEST ===\n{pytest_result.message}")
-
-        if not pytest_result.success:
-            result.failed_tests = self._parse_failed_tests(pytest_result.message)
-
-        # Run black check
-        self.log("Running black formatting check...")
-        black_result = await self.run_command(
-            f"{venv_prefix}python -m black --check --diff ."
-        )
-        result.black_passed = black_result.success
-        if not black_result.success:
-            outputs.append(f"=== BLACK ===\n{black_result.message[:1000]}")
-
-        # Run flake8
-        self.log("Running flake8 lint check...")
-        flake8_result = await self.run_command(
-            f"{venv_prefix}python -m flake8 . --max-line-length=120 --exclude=venv,__pycache__,.git,legacy"
-        )
-        result.flake8_passed = flake8_result.success
-        if not flake8_result.success:
-            outputs.append(f"=== FLAKE8 ===\n{flake8_result.message[:1000]}")
+        check_tasks = [asyncio.create_task(self._run_check("pytest", self._run_pytest(pytest_command)))]
+
+        lint_fingerprints = await fingerprint_task
+        skipped = set()
+        for name, (description, _, _) in self.LINT_CHECKS.items():
+            if self._lint_passed.get((str(self.codebase_path), name)) == lint_fingerprints[name]:
+                self.log(f"Skipping {description} (no Python changes since it passed)")
+                skipped.add(name)
+                check = self._passed_check()
+            else:
+                self.log(f"Running {description}...")
+                check = self.run_command(self._lint_commands[name])
+            check_tasks.append(asyncio.create_task(self._run_check(name, check)))
+        results = dict(await asyncio.gather(*check_tasks))
+        for name in self.LINT_CHECKS:
+            if results[name].success and name not in skipped:
+                self._lint_passed[(str(self.codebase_path), name)] = lint_fingerprints[name]
+
+        result.pytest_passed, result.failed_tests, pytest_output = results["pytest"]
+        outputs.append(f"=== PYTEST ===\n{pytest_output}")
+
+        result.black_passed = results["black"].success
+        result.flake8_passed = results["flake8"].success
+        for name in self.LINT_CHECKS:
+            if not results[name].success:
+                outputs.append(f"=== {name.upper()} ===\n{results[name].message[:1000]}")
 
         # Skip mypy - codebase has pre-existing type errors
         # TODO: Enable once type annotations are fixed
@@ -102,27 +179,112 @@ class TestWorker(BaseWorker):
         """Run specific test file or function."""
         self.log(f"Running tests: {test_path}")
 
-        # Use venv if available (check both Linux and Windows paths)
-        venv_prefix = ""
-        venv_linux = self.codebase_path / "venv" / "bin"
-        venv_windows = self.codebase_path / "venv" / "Scripts"
-        if venv_linux.exists():
-            venv_prefix = f"{venv_linux}/"
-        elif venv_windows.exists():
-            venv_prefix = f"{venv_windows}/"
-
         result = TestResult()
-        pytest_result = await self.run_command(f"{venv_prefix}pytest {test_path} -v")
-
-        result.pytest_passed = pytest_result.success
-        result.all_passed = pytest_result.success
-        result.output = pytest_result.message
+        xdist_args = await self._xdist_args()
+        pytest_passed, result.failed_tests, result.output = await self._run_pytest(
+            self._venv_command("pytest", *shlex.split(test_path), "-v", *xdist_args)
+        )
 
-        if not pytest_result.success:
-            result.failed_tests = self._parse_failed_tests(pytest_result.message)
+        result.pytest_passed = pytest_passed
+        result.all_passed = pytest_passed
 
         return result
 
+    async def _run_check(self, name: str, check: Awaitable[T]) -> Tuple[str, T]:
+        """Run one check once a slot is free; returns (name, result)."""
+        async with self._check_semaphore:
+            return name, await check
+
+    async def _passed_check(self) -> WorkerResult:
+        """Stand-in result for a check that doesn't need to run."""
+        return WorkerResult(success=True)
+
+    def _python_files_fingerprints(self) -> Dict[str, str]:
+        """
+        Fingerprint per lint check: a hash of the path, size and mtime of
+        every Python file the check covers, plus the lint config files.
+
+        One directory walk serves every check; a subdirectory is only
+        entered while some check still covers it.
+        """
+        all_checks = frozenset(self.LINT_CHECKS)
+        entries: Dict[str, List[Tuple[str, os.stat_result]]] = {name: [] for name in all_checks}
+        pending = [(str(self.codebase_path), all_checks)]
+        while pending:
+            directory, checks = pending.pop()
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        # DirEntry's type checks come from the directory read itself
+                        if entry.is_dir(follow_symlinks=False):
+                            covering = frozenset(name for name in checks if entry.name not in self.LINT_CHECKS[name][2])
+                            if covering:
+                                pending.append((entry.path, covering))
+                        elif entry.name.endswith(".py"):
+                            stat = entry.stat()
+                            for name in checks:
+                                entries[name].append((entry.path, stat))
+            except OSError:
+                continue
+        for config_name in self.LINT_CONFIG_FILES:
+            path = str(self.codebase_path / config_name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            for name in all_checks:
+                entries[name].append((path, stat))
+
+        fingerprints = {}
+        for name, check_entries in entries.items():
+            digest = hashlib.blake2b(digest_size=16)
+            for path, stat in sorted(check_entries):
+                digest.update(f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8", "surrogateescape"))
+            fingerprints[name] = digest.hexdigest()
+        return fingerprints
+
+    async def _run_pytest(self, command: List[str]) -> Tuple[bool, List[str], str]:
+        """
+        Run pytest, picking out failed tests as its output streams in.
+
+        Only the last PYTEST_OUTPUT_LINES lines (where pytest prints its
+        failure details and summary) are kept for the report.
+
+        Returns (passed, failed test names, output tail).
+        """
+        failed: List[str] = []
+        tail: Deque[str] = deque(maxlen=self.PYTEST_OUTPUT_LINES)
+
+        pytest_result = WorkerResult(success=False)
+        async for line in self.stream_command(command, status=pytest_result):
+            test = self._parse_failed_test(line)
+            if test:
+                failed.append(test)
+            tail.append(line)
+
+        if pytest_result.success:
+            failed = []
+        return pytest_result.success, failed, "\n".join(tail).strip()
+
+    def _venv_command(self, executable: str, *args: str) -> List[str]:
+        """argv running an executable from the codebase's venv (or PATH if it has none)."""
+        return [f"{self._venv_prefix}{executable}", *args]
+
+    async def _xdist_args(self) -> List[str]:
+        """
+        pytest arguments to spread tests over all CPUs with pytest-xdist.
+
+        Empty if xdist isn't installed in the codebase's environment (pytest
+        would reject -n). --dist=loadfile keeps each file's tests, and so
+        their fixtures, on one worker.
+        """
+        if self._has_xdist is None:
+            probe = await self.run_command(self._venv_command("python", "-c", "import xdist"))
+            self._has_xdist = probe.success
+            if not self._has_xdist:
+                self.log("pytest-xdist not installed, running tests in one process")
+        return ["-n", "auto", "--dist=loadfile"] if self._has_xdist else []
+
     async def validate_issue_fixed(self, issue) -> bool:
         """
         Validate that the issue is fixed by re-running the test agent.
@@ -131,6 +293,19 @@ class TestWorker(BaseWorker):
         """
         self.log(f"Validating fix for: {issue.title}")
 
+        # Re-running the agents on code they've already passed gives the same answer
+        fingerprint = await self._validation_fingerprint(issue)
+        if fingerprint and fingerprint in self._validated_fixed:
+            self.log("Code unchanged since it was validated as fixed, reusing result")
+            return True
+
+        fixed = await self._validate_issue(issue)
+        if fingerprint and fixed:
+            self._validated_fixed.add(fingerprint)
+        return bool(fixed)
+
+    async def _validate_issue(self, issue) -> Optional[bool]:
+        """Run the reporting agent and check the issue is gone; None if the agent couldn't run."""
         # Map reporter to agent module
         agent_map = {
             "Grandma Rose": "grandma_rose",
@@ -146,13 +321,13 @@ class TestWorker(BaseWorker):
 
         # Run the specific agent
         result = await self.run_command(
-            f"python orchestrator.py --agent {agent_key.split('_')[0]}",
+            ["python", "orchestrator.py", "--agent", agent_key.split("_")[0]],
             cwd=self.codebase_path / "dev_platform",
         )
 
         if not result.success:
             self.log(f"Agent run failed: {result.error}", "error")
-            return False
+            return None
 
         # Check if the same issue was found again
         # Look for the issue title in the output
@@ -160,30 +335,83 @@ class TestWorker(BaseWorker):
             self.log("Issue still present after fix", "warning")
             return False
 
-        # Also check the reports directory for the latest report
-        import json
+        # Also check the reports directory for the latest report (off the
+        # event loop - reports can be large)
+        issues = await asyncio.to_thread(self._latest_report_issues)
 
-        reports_dir = self.codebase_path / "dev_platform" / "reports"
-        if reports_dir.exists():
-            reports = sorted(reports_dir.glob("report_*.json"), reverse=True)
-            if reports:
-                latest_report = json.loads(reports[0].read_text())
-                issues = latest_report.get("issues", [])
-
-                # Check if any issue matches
-                for found_issue in issues:
-                    if self._issues_match(issue, found_issue):
-                        self.log("Issue found in latest report", "warning")
-                        return False
+        # Check if any issue matches
+        orig_words = self._title_words(issue.title)
+        for found_issue in issues:
+            if self._issues_match(orig_words, found_issue):
+                self.log("Issue found in latest report", "warning")
+                return False
 
         self.log("Validation passed - issue appears to be fixed")
         return True
 
+    def _latest_report_issues(self) -> List[dict]:
+        """Issues listed in the agents' latest report (empty if there is none)."""
+        reports_dir = self.codebase_path / "dev_platform" / "reports"
+
+        # Report names end in a timestamp, so the latest sorts last. One
+        # directory read, no per-file stat
+        try:
+            with os.scandir(reports_dir) as entries:
+                latest = max(
+                    (e.name for e in entries if e.name.startswith("report_") and e.name.endswith(".json")),
+                    default=None,
+                )
+        except FileNotFoundError:
+            return []
+        if not latest:
+            return []
+        data = (reports_dir / latest).read_bytes()
+        report = orjson.loads(data) if orjson is not None else json.loads(data)
+        return report.get("issues", [])
+
+    async def _validation_fingerprint(self, issue) -> Optional[str]:
+        """
+        Identify an issue plus the exact code state it's validated against.
+
+        Covers HEAD and any uncommitted changes, including the contents of
+        untracked files (git diff leaves those out), so any edit to the
+        codebase gives a new fingerprint. None if git can't describe the tree.
+        """
+        # The agents write their reports into the tree - those aren't code
+        pathspec = ["--", ".", ":(exclude)dev_platform/reports"]
+        head, status, diff, untracked = await asyncio.gather(
+            self.run_command(["git", "rev-parse", "HEAD"]),
+            self.run_command(["git", "status", "--porcelain", "--untracked-files=all", *pathspec]),
+            self.run_command(["git", "diff", "HEAD", *pathspec]),
+            self.run_command(["git", "ls-files", "--others", "--exclude-standard", "-z", *pathspec]),
+        )
+        if not (head.success and status.success and diff.success and untracked.success):
+            return None
+
+        digest = hashlib.sha1()
+        for part in (issue.reporter, issue.title, head.message, status.message, diff.message):
+            digest.update(part.encode("utf-8", "surrogateescape") + b"\0")
+        untracked_files = sorted(path for path in untracked.message.split("\0") if path)
+        digest.update(await asyncio.to_thread(self._hash_files, untracked_files))
+        return digest.hexdigest()
+
+    def _hash_files(self, paths: List[str]) -> bytes:
+        """Digest of the paths and contents of files in the codebase (missing files hash as empty)."""
+        digest = hashlib.sha1()
+        for path in paths:
+            digest.update(path.encode("utf-8", "surrogateescape") + b"\0")
+            try:
+                with open(self.codebase_path / path, "rb") as f:
+                    while chunk := f.read(1 << 16):
+                        digest.update(chunk)
+            except OSError:
+                pass
+            digest.update(b"\0")
+        return digest.digest()
+
     async def _run_orchestrator_validation(self) -> bool:
         """Run the full orchestrator and check results."""
-        result = await self.run_command(
-            "python orchestrator.py", cwd=self.codebase_path / "dev_platform"
-        )
+        result = await self.run_command(["python", "orchestrator.py"], cwd=self.codebase_path / "dev_platform")
 
         # Check for critical/high issues
         if "critical" in result.message.lower():
@@ -193,58 +421,71 @@ class TestWorker(BaseWorker):
             return True
 
         # Parse for issue count
-        import re
-
-        match = re.search(r"Total issues found: (\d+)", result.message)
+        match = _ISSUE_COUNT_RE.search(result.message)
         if match:
             return int(match.group(1)) == 0
 
         return result.success
 
-    def _parse_failed_tests(self, output: str) -> List[str]:
-        """Parse pytest output to extract failed test names."""
-        failed = []
-
-        for line in output.split("\n"):
-            # Look for FAILED lines
-            if "FAILED" in line:
-                # Extract test name
-                import re
-
-                match = re.search(r"FAILED (.+?) -", line)
-                if match:
-                    failed.append(match.group(1))
-
-        return failed
-
-    def _issues_match(self, original, found: dict) -> bool:
-        """Check if two issues are the same."""
+    def _parse_failed_test(self, line: str) -> Optional[str]:
+        """The failed test named by a line of pytest output, if any."""
+        # Look for FAILED lines
+        if "FAILED" in line:
+            # Extract test name
+            match = _FAILED_TEST_RE.search(line)
+            if match:
+                return match.group(1)
+        return None
+
+    def _title_words(self, title: str) -> FrozenSet[str]:
+        """Lowercased words of an issue title, for fuzzy matching."""
+        return frozenset(title.lower().split())
+
+    def _issues_match(self, orig_words: FrozenSet[str], found: dict) -> bool:
+        """Check if a found issue is the original one, given the original title's words."""
         # Compare titles (fuzzy)
-        orig_title = original.title.lower()
-        found_title = found.get("title", "").lower()
+        found_words = self._title_words(found.get("title", ""))
+        if not found_words:
+            return False
 
         # Check for significant overlap
-        orig_words = set(orig_title.split())
-        found_words = set(found_title.split())
-
         overlap = len(orig_words & found_words)
         total = len(orig_words | found_words)
 
-        if total > 0 and overlap / total > 0.5:
-            return True
-
-        return False
+        return overlap / total > 0.5
 
     async def format_code(self) -> bool:
         """Run black to format code."""
-        venv_prefix = ""
-        venv_path = self.codebase_path / "venv" / "bin"
-        if venv_path.exists():
-            venv_prefix = f"{venv_path}/"
-        result = await self.run_command(f"{venv_prefix}black . --exclude venv")
+        result = await self.run_command(self._venv_command("black", ".", "--exclude", "venv"))
         return result.success
 
     async def check_syntax(self, file: str) -> bool:
         """Check Python syntax of a file."""
-        result = await self.run_command(f"python -m py_compile {file}")
-        return result.success
+        return (await self.check_syntax_batch([file]))[file]
+
+    async def check_syntax_batch(self, files: List[str]) -> Dict[str, bool]:
+        """
+        Check Python syntax of several files.
+
+        All files are compiled in memory by one run of the codebase's own
+        interpreter (its venv python, if it has one) rather than a
+        py_compile interpreter per file, so syntax is judged by the Python
+        version the code runs on, and no .pyc files are written.
+
+        Returns {file: syntax ok}; unreadable files count as failures, and
+        so does every file if the interpreter can't be run.
+        """
+        if not files:
+            return {}
+        result = await self.run_command(self._venv_command("python", "-c", _SYNTAX_CHECK_SCRIPT, *files))
+        try:
+            errors = json.loads(result.message.splitlines()[-1]) if result.success else None
+        except (IndexError, ValueError):
+            errors = None
+        if errors is None:
+            self.log(f"Syntax check could not run: {result.error or result.message}", "error")
+            return {file: False for file in files}
+
+        for file, error in errors.items():
+            self.log(f"Syntax check failed for {file}: {error}", "warning")
+        return {file: file not in errors for file in files}